@@ -0,0 +1,152 @@
+import asyncio
+import time
+
+import aiohttp
+from dotenv import load_dotenv
+
+import metrics
+import search_vector
+from embedding_cache import embedding_cache
+from explanation_cache import explanation_cache
+from openai_client import OPENAI_HTTP_MAX_CONNECTIONS, OPENAI_TIMEOUT, CircuitOpenError, chat_client, embedding_client
+from search_vector import (
+    EMBEDDING_MODEL,
+    EXPLANATION_MAX_WORKERS,
+    EXPLANATION_TIMEOUT,
+    candidate_count,
+    chat_request,
+    chat_tokens,
+    embedding_request,
+    estimate_tokens,
+    explanation_request,
+    format_result,
+    get_select_fields,
+    group_by_researcher,
+    search_options,
+)
+
+load_dotenv()
+
+# Keep-alive connections shared by every request of the async app
+# (rate limiting, retries and the circuit breaker come from openai_client, shared with the sync code path)
+http_client = None
+
+
+# aiohttp rather than httpx: httpx's connection pool degrades badly with hundreds of concurrent calls
+def get_http_client():
+    global http_client
+    if http_client is None or http_client.closed:
+        http_client = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=OPENAI_HTTP_MAX_CONNECTIONS),
+            timeout=aiohttp.ClientTimeout(total=EXPLANATION_TIMEOUT),
+        )
+    return http_client
+
+
+async def close_http_client():
+    global http_client
+    if http_client is not None:
+        await http_client.close()
+        http_client = None
+
+
+# Async counterpart of search_vector.get_embedding (same cache, same request).
+# The embedding cache is SQLite-backed, so its reads and writes go through a worker thread.
+async def get_embedding_async(text):
+    cached = await asyncio.to_thread(embedding_cache.get, EMBEDDING_MODEL, text)
+    if cached is not None:
+        return cached
+
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        endpoint, headers, data = embedding_request(text)
+        response_data = await embedding_client.apost(get_http_client(), endpoint, headers, data,
+                                                     tokens=estimate_tokens(text), deadline=OPENAI_TIMEOUT)
+        metrics.record_usage("embeddings", response_data.get("usage"))
+        embedding = response_data['data'][0]['embedding']
+        await asyncio.to_thread(embedding_cache.put, EMBEDDING_MODEL, text, embedding)
+        outcome = "ok"
+        return embedding
+    except Exception as e:
+        print(f"Error generating embedding: {str(e)}")
+        return []
+    finally:
+        metrics.observe_since(metrics.EMBEDDING_SECONDS, started, outcome=outcome)
+
+
+# Async counterpart of search_vector.get_openai_response
+async def get_openai_response_async(messages, timeout=None):
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        endpoint, headers, data = chat_request(messages)
+        timeout = timeout or EXPLANATION_TIMEOUT
+        response_data = await chat_client.apost(get_http_client(), endpoint, headers, data,
+                                                tokens=chat_tokens(messages), timeout=timeout, deadline=timeout)
+        metrics.record_usage("chat", response_data.get("usage"))
+        outcome = "ok"
+        return response_data['choices'][0]['message']['content']
+    except CircuitOpenError:
+        outcome = "circuit_open"
+        return None
+    except Exception as e:
+        print(f"API call error: {repr(e)}")
+        return None
+    finally:
+        metrics.observe_since(metrics.CHAT_SECONDS, started, outcome=outcome)
+
+
+async def generate_explanation_async(query_text, researcher, timeout=None):
+    cache_key, messages = explanation_request(query_text, researcher)
+    cached = explanation_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    explanation = await get_openai_response_async(messages, timeout=timeout)
+    if explanation is not None:
+        explanation_cache.put(cache_key, explanation)
+    return explanation
+
+
+async def find_candidates_async(query_text, top_k=10, mode=None, filters=None):
+    embedding = await get_embedding_async(query_text)
+    if not embedding:
+        print("Failed to generate embedding")
+        return []
+
+    backend = search_vector.search_backend
+    if backend is None:
+        print("Search backend not initialized")
+        return []
+
+    try:
+        options = search_options(query_text, mode, filters)
+        with metrics.SEARCH_SECONDS.labels(
+            backend=backend.name, mode="hybrid" if options["search_text"] else "vector"
+        ).time():
+            return await backend.search_async(embedding, top_k, select=get_select_fields(), **options)
+    except Exception as e:
+        print(f"Search error: {str(e)}")
+        return []
+
+
+# Async search_researchers: explanations run concurrently under a semaphore, results stay in score order
+async def search_researchers_async(category, field, description, top_k=10, explain=True,
+                                   max_concurrency=None, timeout=None, mode=None, filters=None,
+                                   aggregation=None, aggregation_top_n=None):
+    query_text = f"{category} {field} {description}"
+    hits = await find_candidates_async(query_text, candidate_count(top_k, aggregation), mode, filters)
+    if aggregation:
+        hits = group_by_researcher(hits, top_k, aggregation, aggregation_top_n)
+    if not explain:
+        return [format_result(hit) for hit in hits]
+
+    semaphore = asyncio.Semaphore(max_concurrency or EXPLANATION_MAX_WORKERS)
+
+    async def explain_hit(hit):
+        async with semaphore:
+            return await generate_explanation_async(query_text, hit, timeout)
+
+    explanations = await asyncio.gather(*(explain_hit(hit) for hit in hits))
+    return [format_result(hit, explanation) for hit, explanation in zip(hits, explanations)]
@@ -0,0 +1,248 @@
+import hashlib
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+from dotenv import load_dotenv
+
+import models
+from database import SessionLocal
+from matching import existing_matchings, insert_matchings
+from search_vector import (
+    EMBEDDING_MAX_INPUT_TOKENS,
+    EMBEDDING_MODEL,
+    LOCAL_INDEX_PATH,
+    SEARCH_OVERFETCH,
+    generate_explanations,
+    get_embeddings,
+    group_by_researcher,
+)
+from vector_index import LocalVectorIndex
+
+load_dotenv()
+
+# Offline project -> researcher matching.
+# Researcher vectors come from the LocalVectorIndex files (kept current with `python index_sync.py --target local`),
+# every open project is embedded in batches and scored against the whole matrix with one matrix multiply.
+#   python batch_matching.py [--top-k 10] [--workers 4] [--explain] [--full]
+BATCH_MATCHING_STATE_PATH = os.getenv("BATCH_MATCHING_STATE_PATH", "batch_matching_state.sqlite3")
+BATCH_MATCHING_BATCH_SIZE = int(os.getenv("BATCH_MATCHING_BATCH_SIZE", "512"))
+BATCH_MATCHING_TOP_K = int(os.getenv("BATCH_MATCHING_TOP_K", "10"))
+BATCH_MATCHING_WORKERS = int(os.getenv("BATCH_MATCHING_WORKERS", str(os.cpu_count() or 1)))
+# Upper bound for one (projects x documents) float32 score block
+BATCH_MATCHING_BLOCK_BYTES = int(os.getenv("BATCH_MATCHING_BLOCK_BYTES", str(256 * 1024 * 1024)))
+
+
+def project_text(project):
+    text = " ".join(filter(None, [project["project_title"], project["project_content"], project["detailed_task"]]))
+    return text[:EMBEDDING_MAX_INPUT_TOKENS]
+
+
+# The embedding model is part of the hash so a model switch re-matches everything
+def project_hash(project):
+    payload = "\0".join([EMBEDDING_MODEL, project["project_title"] or "", project["project_content"] or "",
+                         project["detailed_task"] or ""])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# Open projects (project_status == 0, application deadline still ahead) in keyset-paginated batches,
+# one short query per batch so matchings can be committed between batches
+def iter_open_project_batches(db, batch_size=BATCH_MATCHING_BATCH_SIZE):
+    now = datetime.now()
+    last_project_id = 0
+    while True:
+        rows = db.query(
+            models.ProjectInformation.project_id,
+            models.ProjectInformation.project_title,
+            models.ProjectInformation.project_content,
+            models.ProjectInformation.detailed_task,
+        ).filter(
+            models.ProjectInformation.project_status == 0,
+            models.ProjectInformation.application_deadline > now,
+            models.ProjectInformation.project_id > last_project_id,
+        ).order_by(models.ProjectInformation.project_id).limit(batch_size).all()
+        if not rows:
+            return
+        last_project_id = rows[-1].project_id
+        yield [
+            {
+                "project_id": row.project_id,
+                "project_title": row.project_title,
+                "project_content": row.project_content,
+                "detailed_task": row.detailed_task,
+            }
+            for row in rows
+        ]
+
+
+class MatchingState:
+    """Content hash of every project already matched, kept in a local SQLite file."""
+
+    def __init__(self, path=BATCH_MATCHING_STATE_PATH):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS project_state ("
+            " project_id INTEGER PRIMARY KEY, hash TEXT NOT NULL, matched_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    def hashes(self, project_ids):
+        placeholders = ",".join("?" * len(project_ids))
+        rows = self.conn.execute(
+            f"SELECT project_id, hash FROM project_state WHERE project_id IN ({placeholders})", list(project_ids)
+        )
+        return dict(rows.fetchall())
+
+    def mark(self, hashes):
+        now = time.time()
+        self.conn.executemany(
+            "INSERT INTO project_state (project_id, hash, matched_at) VALUES (?, ?, ?)"
+            " ON CONFLICT(project_id) DO UPDATE SET hash = excluded.hash, matched_at = excluded.matched_at",
+            [(project_id, value, now) for project_id, value in hashes.items()],
+        )
+        self.conn.commit()
+
+    def reset(self):
+        self.conn.execute("DELETE FROM project_state")
+        self.conn.commit()
+
+
+_worker_index = None
+
+
+def _init_worker(path):
+    global _worker_index
+    # Memory-mapped, so every worker shares the same page cache instead of copying the matrix
+    _worker_index = LocalVectorIndex.load(path)
+
+
+# Best `depth` index rows per query row, score blocks bounded by BATCH_MATCHING_BLOCK_BYTES
+def _top_rows(vectors, queries, depth):
+    count = len(vectors)
+    depth = min(depth, count)
+    if depth == 0:
+        return np.empty((len(queries), 0), dtype=np.int64), np.empty((len(queries), 0), dtype=np.float32)
+    block = max(1, BATCH_MATCHING_BLOCK_BYTES // (count * 4))
+    rows = np.empty((len(queries), depth), dtype=np.int64)
+    scores = np.empty((len(queries), depth), dtype=np.float32)
+    for start in range(0, len(queries), block):
+        block_scores = queries[start:start + block] @ vectors.T
+        if depth < count:
+            best = np.argpartition(-block_scores, depth - 1, axis=1)[:, :depth]
+        else:
+            best = np.tile(np.arange(count), (len(block_scores), 1))
+        best_scores = np.take_along_axis(block_scores, best, axis=1)
+        order = np.argsort(-best_scores, axis=1)
+        rows[start:start + block] = np.take_along_axis(best, order, axis=1)
+        scores[start:start + block] = np.take_along_axis(best_scores, order, axis=1)
+    return rows, scores
+
+
+def _match_chunk(queries, depth):
+    return _top_rows(_worker_index.vectors, queries, depth)
+
+
+# Top documents for every query vector; the rows are split across worker processes when a pool is given
+def top_documents(index, queries, depth, executor=None, workers=1):
+    queries = np.asarray(queries, dtype=np.float32)
+    queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+    if executor is None or workers <= 1 or len(queries) < 2 * workers:
+        return _top_rows(index.vectors, queries, depth)
+    chunks = np.array_split(queries, workers)
+    results = list(executor.map(_match_chunk, chunks, [depth] * len(chunks)))
+    return np.concatenate([rows for rows, _ in results]), np.concatenate([scores for _, scores in results])
+
+
+def matching_reason(researcher):
+    titles = " / ".join(project["research_project_title"] or "" for project in researcher["projects"])
+    return f"類似研究課題: {titles}（類似度 {researcher['@search.score']:.3f}）"
+
+
+# Embed changed open projects batch by batch, score them against every researcher document and
+# insert the top_k researchers per project (pairs that already exist are left untouched)
+def run_batch_matching(index, state, top_k=BATCH_MATCHING_TOP_K, workers=BATCH_MATCHING_WORKERS,
+                       batch_size=BATCH_MATCHING_BATCH_SIZE, explain=False, index_path=LOCAL_INDEX_PATH, db=None):
+    stats = {"scanned": 0, "matched_projects": 0, "inserted": 0}
+    if not len(index):
+        print("Local vector index is empty; run index_sync.py --target local first")
+        return stats
+    own_session = db is None
+    db = db or SessionLocal()
+    depth = top_k * SEARCH_OVERFETCH
+    executor = None
+    if workers > 1:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(index_path,))
+
+    def match_batch(batch):
+        hashes = {project["project_id"]: project_hash(project) for project in batch}
+        known = state.hashes(list(hashes))
+        changed = [project for project in batch if known.get(project["project_id"]) != hashes[project["project_id"]]]
+        stats["scanned"] += len(batch)
+        if not changed:
+            return
+
+        rows, scores = top_documents(index, get_embeddings([project_text(p) for p in changed]), depth, executor, workers)
+        candidates = {}
+        for project, project_rows, project_scores in zip(changed, rows, scores):
+            hits = [
+                {**index.documents[row], "@search.score": float(score)}
+                for row, score in zip(project_rows.tolist(), project_scores.tolist())
+            ]
+            candidates[project["project_id"]] = group_by_researcher(hits, top_k, "max")
+
+        existing = existing_matchings(db, [
+            (project_id, int(hit["researcher_id"])) for project_id, hits in candidates.items() for hit in hits
+        ])
+        new_rows = []
+        for project in changed:
+            hits = [hit for hit in candidates[project["project_id"]]
+                    if (project["project_id"], int(hit["researcher_id"])) not in existing]
+            # Explanations that could not be generated (chat circuit open, API errors) fall back to the template reason
+            reasons = generate_explanations(project_text(project), hits) if explain else [None] * len(hits)
+            new_rows.extend(
+                {"project_id": project["project_id"], "researcher_id": int(hit["researcher_id"]),
+                 "matching_reason": reason or matching_reason(hit)}
+                for hit, reason in zip(hits, reasons)
+            )
+        insert_matchings(db, new_rows)
+        state.mark({project["project_id"]: hashes[project["project_id"]] for project in changed})
+        stats["matched_projects"] += len(changed)
+        stats["inserted"] += len(new_rows)
+        print(f"Matched {stats['matched_projects']}/{stats['scanned']} projects ({stats['inserted']} matchings inserted)")
+
+    try:
+        for batch in iter_open_project_batches(db, batch_size):
+            match_batch(batch)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        if own_session:
+            db.close()
+
+    print(f"Batch matching finished: {stats}")
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Precompute project -> researcher matchings for open projects")
+    parser.add_argument("--index", default=LOCAL_INDEX_PATH, help="LocalVectorIndex path prefix")
+    parser.add_argument("--top-k", type=int, default=BATCH_MATCHING_TOP_K)
+    parser.add_argument("--workers", type=int, default=BATCH_MATCHING_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=BATCH_MATCHING_BATCH_SIZE)
+    parser.add_argument("--explain", action="store_true", help="generate an LLM explanation per matching")
+    parser.add_argument("--full", action="store_true", help="forget stored hashes and re-match every open project")
+    args = parser.parse_args()
+
+    if not all(os.path.exists(f"{args.index}{suffix}") for suffix in (".npy", ".json")):
+        parser.error(f"local vector index not found at {args.index}.npy/.json "
+                     "(build it with: python index_sync.py --target local)")
+    matching_state = MatchingState()
+    if args.full:
+        matching_state.reset()
+    run_batch_matching(LocalVectorIndex.load(args.index), matching_state, args.top_k, args.workers,
+                       args.batch_size, args.explain, args.index)
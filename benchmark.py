@@ -0,0 +1,611 @@
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import io
+import json
+import os
+import platform
+import random
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import aiohttp
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import models
+from vector_index import LocalVectorIndex, SELECT_FIELDS
+
+# Reproducible throughput/latency benchmark for every endpoint of the sync (main:app) and async (main_async:app)
+# apps and for search_vector.search_researchers in-process.
+# MySQL is replaced by a generated SQLite file, Azure OpenAI by FakeOpenAIServer and Azure AI Search by
+# FakeSearchServer (the real SDK talking to a local LocalVectorIndex) or the in-process local backend.
+#   python benchmark.py --concurrency 64 --duration 15 [--scale 5] [--compare bench_data/report-<commit>.json]
+#   python benchmark.py --prepare-only   # data + fakes only, then drive an app with locustfile.py
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+FAMILY_NAMES = [
+    ("山田", "やまだ", "Yamada"), ("佐藤", "さとう", "Sato"), ("鈴木", "すずき", "Suzuki"),
+    ("高橋", "たかはし", "Takahashi"), ("田中", "たなか", "Tanaka"), ("伊藤", "いとう", "Ito"),
+    ("渡辺", "わたなべ", "Watanabe"), ("中村", "なかむら", "Nakamura"), ("小林", "こばやし", "Kobayashi"),
+    ("加藤", "かとう", "Kato"),
+]
+GIVEN_NAMES = [
+    ("太郎", "たろう", "Taro"), ("花子", "はなこ", "Hanako"), ("健", "けん", "Ken"), ("美咲", "みさき", "Misaki"),
+    ("翔", "しょう", "Sho"), ("陽子", "ようこ", "Yoko"), ("大輔", "だいすけ", "Daisuke"), ("愛", "あい", "Ai"),
+]
+RESEARCH_FIELDS = {
+    "情報学": ["機械学習", "自然言語処理", "画像認識", "データベース", "感情分析"],
+    "化学": ["触媒", "有機合成", "高分子", "電気化学", "分析化学"],
+    "材料工学": ["金属材料", "腐食", "セラミックス", "複合材料", "薄膜"],
+    "生命科学": ["ゲノム", "遺伝子発現", "タンパク質", "細胞生物学", "免疫"],
+    "機械工学": ["流体力学", "ロボティクス", "伝熱", "振動", "制御工学"],
+}
+AFFILIATIONS = ["東京大学", "京都大学", "大阪大学", "東北大学", "九州大学", "名古屋大学"]
+POSITIONS = ["教授", "准教授", "講師", "助教"]
+CATEGORIES = ["共同研究", "技術相談", "受託研究", "講演依頼"]
+
+
+# Deterministic pseudo-embedding so the same text always maps to the same vector
+def fake_embedding(text, dim):
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    return np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops connections under a burst of concurrent explanation calls
+    request_queue_size = 1024
+
+
+class _JSONHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def read_json(self):
+        return json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+
+    def send_json(self, payload, content_type="application/json"):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class _FakeServer:
+    def __init__(self, handler, port=0):
+        self.httpd = _Server(("127.0.0.1", port), handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+
+
+class FakeOpenAIServer(_FakeServer):
+    """Local stand-in for the Azure OpenAI embeddings and chat-completions endpoints with artificial latency."""
+
+    def __init__(self, embedding_latency=0.05, chat_latency=0.5, dim=256, port=0):
+        self.embedding_latency = embedding_latency
+        self.chat_latency = chat_latency
+        self.dim = dim
+        self.requests = {"embeddings": 0, "chat": 0}
+        server = self
+
+        class Handler(_JSONHandler):
+            def do_POST(self):
+                body = self.read_json()
+                if "/embeddings" in self.path:
+                    server.requests["embeddings"] += 1
+                    time.sleep(server.embedding_latency)
+                    inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+                    payload = {
+                        "data": [
+                            {"index": i, "embedding": fake_embedding(text, server.dim).tolist()}
+                            for i, text in enumerate(inputs)
+                        ],
+                        "usage": {"prompt_tokens": sum(len(t) for t in inputs), "total_tokens": sum(len(t) for t in inputs)},
+                    }
+                else:
+                    server.requests["chat"] += 1
+                    time.sleep(server.chat_latency)
+                    payload = {
+                        "choices": [{"message": {"role": "assistant", "content": "この研究者は依頼内容に関連する研究実績があります。"}}],
+                        "usage": {"prompt_tokens": 120, "completion_tokens": 40, "total_tokens": 160},
+                    }
+                self.send_json(payload)
+
+        super().__init__(Handler, port)
+
+
+_ISMATCH = re.compile(r"search\.ismatch\('\"(.*?)\"', '(\w+)'\)")
+
+
+# Inverse of vector_index.odata_filter (the only filter shape the app sends)
+def parse_odata_filter(expression):
+    if not expression:
+        return None
+    filters = {}
+    for value, field in _ISMATCH.findall(expression):
+        filters.setdefault(field, []).append(value.replace("''", "'"))
+    return filters
+
+
+class FakeSearchServer(_FakeServer):
+    """Local stand-in for the Azure AI Search documents API (docs/search.post.search) backed by a LocalVectorIndex.
+
+    The app keeps using AzureSearchBackend and the real SDK, including hybrid queries and filters.
+    """
+
+    def __init__(self, index, latency=0.03, port=0):
+        self.index = index
+        self.latency = latency
+        self.requests = 0
+        server = self
+
+        class Handler(_JSONHandler):
+            def do_POST(self):
+                body = self.read_json()
+                server.requests += 1
+                time.sleep(server.latency)
+                vector_query = (body.get("vectorQueries") or [{}])[0]
+                results = server.index.search(
+                    vector_query["vector"],
+                    body.get("top") or vector_query.get("k") or 50,
+                    body["select"].split(",") if body.get("select") else SELECT_FIELDS,
+                    search_text=body.get("search"),
+                    filters=parse_odata_filter(body.get("filter")),
+                )
+                self.send_json({"value": results}, "application/json; odata.metadata=none")
+
+        super().__init__(Handler, port)
+
+
+def _insert(db, model, rows, chunk_size=10000):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            db.execute(model.__table__.insert(), chunk)
+            chunk = []
+    if chunk:
+        db.execute(model.__table__.insert(), chunk)
+
+
+# Synthetic data for every table in models.py; returns the row counts the scenarios draw ids from
+def seed_database(url, researchers=2000, projects=200, companies=20, users_per_company=2,
+                  research_projects_per_researcher=3, matchings_per_researcher=5, messages_per_matching=2, seed=0):
+    engine = create_engine(url)
+    models.Base.metadata.drop_all(engine)
+    models.Base.metadata.create_all(engine)
+    rng = random.Random(seed)
+    now = datetime.now()
+    company_users = companies * users_per_company
+    fields = list(RESEARCH_FIELDS)
+    researcher_fields = [rng.choice(fields) for _ in range(researchers)]
+    matchings = researchers * matchings_per_researcher
+
+    def researcher_row(i):
+        family, given = rng.choice(FAMILY_NAMES), rng.choice(GIVEN_NAMES)
+        field = researcher_fields[i - 1]
+        return {
+            "researcher_id": i,
+            "researcher_name": f"{family[0]} {given[0]}",
+            "researcher_name_kana": f"{family[1]} {given[1]}",
+            "researcher_name_alphabet": f"{given[2]} {family[2]}",
+            "researcher_affiliation_current": rng.choice(AFFILIATIONS),
+            "researcher_department_current": f"{field}研究科",
+            "researcher_position_current": rng.choice(POSITIONS),
+            "research_field_pi": field,
+            "keywords_pi": ",".join(rng.sample(RESEARCH_FIELDS[field], 3)),
+            "researcher_email": f"r{i}@example.ac.jp",
+        }
+
+    def research_project_rows():
+        for i in range(1, researchers + 1):
+            keywords = RESEARCH_FIELDS[researcher_fields[i - 1]]
+            for _ in range(research_projects_per_researcher):
+                topic = rng.choice(keywords)
+                yield {
+                    "researcher_id": i,
+                    "research_project_title": f"{topic}に関する{rng.choice(['基礎', '応用', '実証'])}研究",
+                    "research_project_details": f"{topic}と{rng.choice(keywords)}を組み合わせた研究開発",
+                    "research_field": researcher_fields[i - 1],
+                    "research_achievement": "論文・特許",
+                }
+
+    def project_rows():
+        for i in range(1, projects + 1):
+            field = rng.choice(fields)
+            topic = rng.choice(RESEARCH_FIELDS[field])
+            yield {
+                "project_id": i, "company_user_id": rng.randint(1, company_users),
+                "project_title": f"{topic}の技術相談{i}", "consultation_category": rng.choice(CATEGORIES),
+                "project_content": f"{topic}を活用した新製品の開発について相談したい。" * 5,
+                "research_field": field, "preferred_researcher_level": rng.choice(POSITIONS),
+                "application_deadline": now + timedelta(days=rng.randint(-30, 90)),
+                "project_status": 0 if rng.random() < 0.9 else 1,
+                "detailed_task": f"{topic}の評価手法の検討", "budget": rng.randint(10, 500) * 10000,
+                "registration_date": now - timedelta(days=rng.randint(0, 365)),
+            }
+
+    def matching_rows():
+        for r in range(1, researchers + 1):
+            for _ in range(matchings_per_researcher):
+                yield {"project_id": rng.randint(1, projects), "researcher_id": r, "matching_reason": "類似研究課題あり",
+                       "matching_status": rng.choice([0, 0, 0, 1, 2]), "matched_date": now - timedelta(days=rng.randint(0, 60))}
+
+    def message_rows():
+        for m in range(1, matchings + 1):
+            for k in range(messages_per_matching):
+                yield {"matching_id": m, "message_content": f"メッセージ{k + 1}", "sender_classification": k % 2,
+                       "post_datetime": now - timedelta(minutes=rng.randint(0, 60 * 24 * 30)),
+                       "message_status": rng.choice([0, 1])}
+
+    with sessionmaker(bind=engine)() as db:
+        _insert(db, models.Company, (
+            {"company_id": i, "company_name": f"企業{i}", "contract_plan": rng.choice(["standard", "premium"])}
+            for i in range(1, companies + 1)
+        ))
+        _insert(db, models.CompanyUser, (
+            {"company_user_id": i, "company_user_name": f"担当者{i}", "company_id": (i - 1) % companies + 1,
+             "department": "研究開発部", "email_address": f"user{i}@example.com", "password": "x"}
+            for i in range(1, company_users + 1)
+        ))
+        _insert(db, models.ProjectInformation, project_rows())
+        _insert(db, models.ResearcherInformation, (researcher_row(i) for i in range(1, researchers + 1)))
+        _insert(db, models.ResearchProject, research_project_rows())
+        _insert(db, models.MatchingInformation, matching_rows())
+        _insert(db, models.MessageInformation, message_rows())
+        db.commit()
+    engine.dispose()
+    return {
+        "companies": companies, "company_users": company_users, "projects": projects, "researchers": researchers,
+        "research_projects": researchers * research_projects_per_researcher, "matchings": matchings,
+        "messages": matchings * messages_per_matching,
+    }
+
+
+# Index documents exactly as index_sync builds them, embedded with fake_embedding
+def build_local_index(path, url, dim=256):
+    from index_sync import document_text, iter_documents
+
+    engine = create_engine(url)
+    with sessionmaker(bind=engine)() as db:
+        documents = list(iter_documents(db))
+    engine.dispose()
+    vectors = np.stack([fake_embedding(document_text(document), dim) for document in documents])
+    index = LocalVectorIndex.from_vectors(vectors, documents)
+    index.save(path)
+    return index
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_app(module, env, port):
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", f"{module}:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        env=env, cwd=REPO_DIR,
+        stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"{module} did not start on port {port}")
+
+
+def summarize(latencies, errors, duration):
+    latencies.sort()
+
+    def percentile(p):
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 2) if latencies else None
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / duration, 1),
+        "p50_ms": percentile(0.50),
+        "p90_ms": percentile(0.90),
+        "p99_ms": percentile(0.99),
+    }
+
+
+# Closed-loop load: `concurrency` clients each send requests back to back for `duration` seconds
+async def run_load(base_url, make_request, concurrency, duration):
+    latencies = []
+    errors = 0
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(base_url, connector=connector, timeout=aiohttp.ClientTimeout(total=60)) as client:
+        deadline = time.perf_counter() + duration
+
+        async def worker(worker_id):
+            nonlocal errors
+            rng = random.Random(worker_id)
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    async with make_request(client, rng) as response:
+                        await response.read()
+                        if response.status >= 400:
+                            errors += 1
+                        else:
+                            latencies.append(time.perf_counter() - started)
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    errors += 1
+
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+
+    return summarize(latencies, errors, duration)
+
+
+# Same closed loop for an in-process call, one thread per client
+def run_inprocess_load(call, concurrency, duration):
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(worker_id):
+        nonlocal errors
+        rng = random.Random(worker_id)
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                call(rng)
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed)
+            except Exception:
+                with lock:
+                    errors += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return summarize(latencies, errors, duration)
+
+
+def _search_body(rng, **extra):
+    field = rng.choice(list(RESEARCH_FIELDS))
+    return {"category": rng.choice(CATEGORIES), "field": field,
+            "description": f"{rng.choice(RESEARCH_FIELDS[field])} {rng.randint(0, 10 ** 9)}", "top_k": 5, **extra}
+
+
+# HTTP scenarios: (client, rng, data) -> request context manager; data holds the seeded row counts
+SCENARIOS = {
+    "root": lambda client, rng, data: client.get("/"),
+    "researchers": lambda client, rng, data: client.get(
+        "/researchers", params={"limit": 20, "after_id": rng.randint(0, data["researchers"])}
+    ),
+    "researchers-filtered": lambda client, rng, data: client.get(
+        "/researchers", params={"limit": 20, "research_field": rng.choice(list(RESEARCH_FIELDS)),
+                                "keywords": rng.choice(RESEARCH_FIELDS[rng.choice(list(RESEARCH_FIELDS))])}
+    ),
+    "researchers-ndjson": lambda client, rng, data: client.get(
+        "/researchers", params={"format": "ndjson", "research_field": rng.choice(list(RESEARCH_FIELDS)),
+                                "after_id": max(0, data["researchers"] - 500)}
+    ),
+    "search-researcher": lambda client, rng, data: client.get(
+        "/search-researcher", params={"name": rng.choice(FAMILY_NAMES)[rng.randint(0, 2)]}
+    ),
+    "search": lambda client, rng, data: client.post("/search", json=_search_body(rng)),
+    "search-hybrid": lambda client, rng, data: client.post(
+        "/search", json=_search_body(rng, mode="hybrid", research_field=rng.choice(list(RESEARCH_FIELDS)))
+    ),
+    "search-grouped": lambda client, rng, data: client.post("/search", json=_search_body(rng, aggregation="max")),
+    "matching-information": lambda client, rng, data: client.get(
+        "/matching-information", params={"researcher_id": rng.randint(1, data["researchers"]), "matching_status": 0}
+    ),
+    "matching-id": lambda client, rng, data: client.get(f"/matching-id/{rng.randint(1, data['matchings'])}"),
+    "matching-status": lambda client, rng, data: client.patch(
+        f"/matching-status/{rng.randint(1, data['matchings'])}", params={"new_status": rng.randint(0, 2)}
+    ),
+    "matching-status-bulk": lambda client, rng, data: client.patch(
+        "/matching-status", json={"matching_ids": rng.sample(range(1, data["matchings"] + 1), 20),
+                                  "new_status": rng.randint(0, 2)}
+    ),
+    "messages": lambda client, rng, data: client.get(
+        f"/matching-messages/{rng.randint(1, data['matchings'])}", params={"limit": 50}
+    ),
+    "message-post": lambda client, rng, data: client.post(
+        f"/matching-messages/{rng.randint(1, data['matchings'])}",
+        json={"message_content": f"ベンチマーク {rng.randint(0, 10 ** 9)}", "sender_classification": rng.randint(0, 1)}
+    ),
+    "message-unread-counts": lambda client, rng, data: client.get(
+        "/matching-unread-counts", params={"researcher_id": rng.randint(1, data["researchers"])}
+    ),
+    "metrics": lambda client, rng, data: client.get("/metrics"),
+}
+
+
+def search_researchers_call(rng):
+    import search_vector
+
+    body = _search_body(rng)
+    search_vector.search_researchers(body["category"], body["field"], body["description"], top_k=body["top_k"])
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_DIR,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+# Print rps / p50 / p99 changes of every scenario+mode present in both reports
+def compare_reports(baseline, report):
+    print(f"\nvs {baseline['meta']['commit']} ({baseline['meta']['timestamp']})")
+    for scenario, modes in report["results"].items():
+        for mode, result in modes.items():
+            base = baseline["results"].get(scenario, {}).get(mode)
+            if not base:
+                continue
+
+            def change(key):
+                if not base.get(key) or result.get(key) is None:
+                    return f"{key}={result.get(key)}"
+                return f"{key}={base[key]}->{result[key]} ({(result[key] - base[key]) / base[key] * 100:+.1f}%)"
+
+            print(f"{scenario:<22} {mode:<7} {change('rps')}  {change('p50_ms')}  {change('p99_ms')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Endpoint and search_researchers benchmark with local fakes")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--warmup", type=float, default=1.0, help="seconds of unrecorded load before each scenario")
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--modes", nargs="+", default=["sync", "async", "inprocess"],
+                        choices=["sync", "async", "inprocess"],
+                        help="inprocess runs search_vector.search_researchers directly (no HTTP)")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplies researchers/projects/companies")
+    parser.add_argument("--search-backend", choices=["azure", "local"], default="azure",
+                        help="azure: real SDK against FakeSearchServer; local: in-process LocalVectorIndex")
+    parser.add_argument("--search-latency", type=float, default=0.03)
+    parser.add_argument("--embedding-latency", type=float, default=0.05)
+    parser.add_argument("--chat-latency", type=float, default=0.5)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--workdir", default="bench_data")
+    parser.add_argument("--output", help="report path (default: <workdir>/report-<commit>.json)")
+    parser.add_argument("--compare", help="earlier report to compare against")
+    parser.add_argument("--prepare-only", action="store_true",
+                        help="generate data, start the fakes and print the app environment, then wait")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    os.makedirs(args.workdir, exist_ok=True)
+    db_path = os.path.abspath(os.path.join(args.workdir, "bench.sqlite3"))
+    index_path = os.path.abspath(os.path.join(args.workdir, "bench_index"))
+    fake = FakeOpenAIServer(args.embedding_latency, args.chat_latency, args.dim).start()
+
+    # Set before search_vector / index_sync are imported so the in-process run sees the fakes too
+    env = {
+        "DATABASE_URL": f"sqlite:///{db_path}",
+        "ASYNC_DATABASE_URL": f"sqlite+aiosqlite:///{db_path}",
+        "AZURE_OPENAI_ENDPOINT": fake.url,
+        "AZURE_OPENAI_GPT_ENDPOINT": fake.url,
+        "SEARCH_BACKEND": args.search_backend,
+        "LOCAL_INDEX_PATH": index_path,
+        "AZURE_SEARCH_INDEX_NAME": "researchers",
+        "AZURE_SEARCH_API_KEY": "benchmark",
+        "EMBEDDING_CACHE_PATH": "",
+        "EXPLANATION_CACHE_SIZE": "0",
+        "RESPONSE_CACHE_URL": "",
+    }
+
+    search_server = None
+    if args.search_backend == "azure":
+        search_server = FakeSearchServer(None, args.search_latency).start()
+        env["AZURE_SEARCH_ENDPOINT"] = search_server.url
+    os.environ.update(env)
+
+    scale = args.scale
+    data = seed_database(f"sqlite:///{db_path}", researchers=int(2000 * scale), projects=int(200 * scale),
+                         companies=max(1, int(20 * scale)))
+    index = build_local_index(index_path, f"sqlite:///{db_path}", args.dim)
+    if search_server is not None:
+        search_server.index = index
+    print(f"Seeded {data}, indexed {len(index)} documents")
+
+    if args.prepare_only:
+        print("Start an app with:")
+        print(" ".join(f"{key}='{value}'" for key, value in env.items()) + " python -m uvicorn main:app")
+        print("then e.g.: locust -f locustfile.py --host http://127.0.0.1:8000  (Ctrl-C to stop the fakes)")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            return None
+
+    report = {
+        "meta": {
+            "commit": git_commit(), "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(), "platform": platform.platform(), "cpu_count": os.cpu_count(),
+        },
+        "config": {**vars(args), "data": data},
+        "results": {},
+    }
+
+    def record(scenario, mode, result):
+        report["results"].setdefault(scenario, {})[mode] = result
+        print(f"{scenario:<22} {mode:<9} rps={result['rps']:<8} p50={result['p50_ms']}ms p99={result['p99_ms']}ms "
+              f"errors={result['errors']}")
+
+    app_env = dict(os.environ, **env)
+    for mode in [mode for mode in args.modes if mode != "inprocess"]:
+        port = free_port()
+        process = start_app("main" if mode == "sync" else "main_async", app_env, port)
+        try:
+            for scenario in args.scenarios:
+                make_request = lambda client, rng, scenario=scenario: SCENARIOS[scenario](client, rng, data)
+                # Unrecorded warm-up so lazily built indexes and cold caches don't land in the percentiles
+                asyncio.run(run_load(f"http://127.0.0.1:{port}", make_request, args.concurrency, args.warmup))
+                result = asyncio.run(run_load(f"http://127.0.0.1:{port}", make_request, args.concurrency, args.duration))
+                record(scenario, mode, result)
+        finally:
+            process.terminate()
+            process.wait()
+
+    if "inprocess" in args.modes:
+        import search_vector
+
+        # search_vector was imported (by index_sync) before the local index files existed
+        search_vector.search_backend = search_vector.create_search_backend()
+        search_vector.refresh_index_schema()
+        run_inprocess_load(search_researchers_call, args.concurrency, args.warmup)
+        record("search_researchers", "inprocess",
+               run_inprocess_load(search_researchers_call, args.concurrency, args.duration))
+
+    fake.stop()
+    if search_server is not None:
+        search_server.stop()
+
+    output = args.output or os.path.join(args.workdir, f"report-{report['meta']['commit']}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Report written to {output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare_reports(json.load(f), report)
+    return report
+
+
+if __name__ == "__main__":
+    main()
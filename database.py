@@ -1,17 +1,18 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 import os
+import ssl
+import threading
+import time
 from dotenv import load_dotenv
+import metrics
 
 # Load environment variables
 load_dotenv()
 
-# Print environment variables (for debugging)
-print("DB_HOST:", os.getenv("DB_HOST"))
-print("DB_USER:", os.getenv("DB_USER"))
-print("DB_NAME:", os.getenv("DB_NAME"))
-
 # Database connection configuration
 config = {
     'host': os.getenv("DB_HOST"),
@@ -21,11 +22,111 @@ config = {
     'ssl_ca': os.getenv("SSL_CA_PATH")
 }
 
-# Create SQLAlchemy connection string
-DATABASE_URL = f"mysql+mysqlconnector://{config['user']}:{config['password']}@{config['host']}/{config['database']}"f"?ssl_ca={config['ssl_ca']}"
+# Connection pool configuration
+pool_config = {
+    'pool_size': int(os.getenv("DB_POOL_SIZE", "10")),
+    'max_overflow': int(os.getenv("DB_MAX_OVERFLOW", "20")),
+    # Azure MySQL drops idle connections, so recycle them well before its timeout
+    'pool_recycle': int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    'pool_pre_ping': os.getenv("DB_POOL_PRE_PING", "true").lower() == "true",
+    'pool_timeout': float(os.getenv("DB_POOL_TIMEOUT", "30")),
+}
+
+# Create SQLAlchemy connection string (DATABASE_URL overrides it, e.g. a SQLite stand-in for load tests)
+DATABASE_URL = os.getenv("DATABASE_URL") or (
+    f"mysql+mysqlconnector://{config['user']}:{config['password']}@{config['host']}/{config['database']}"f"?ssl_ca={config['ssl_ca']}"
+)
+# Optional async driver for FastAPI ("aiomysql" or "asyncmy"); ASYNC_DATABASE_URL overrides it
+DB_ASYNC_DRIVER = os.getenv("DB_ASYNC_DRIVER", "aiomysql")
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or (
+    f"mysql+{DB_ASYNC_DRIVER}://{config['user']}:{config['password']}@{config['host']}/{config['database']}"
+)
+
+
+class PoolMetrics:
+    """Counters for pool checkouts, wait time, timeouts and connection churn."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_wait(self, seconds):
+        with self._lock:
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def increment(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self, pool=None):
+        with self._lock:
+            result = {
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+                "wait_seconds_avg": round(self.wait_seconds_total / self.checkouts, 6) if self.checkouts else 0.0,
+            }
+        if isinstance(pool, QueuePool):
+            result.update({
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "max_overflow": pool._max_overflow,
+            })
+        return result
+
+
+pool_metrics = PoolMetrics()
+
+
+class InstrumentedQueuePool(QueuePool):
+    # Time spent waiting for a free connection (or opening a new one)
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            pool_metrics.increment("timeouts")
+            raise
+        finally:
+            pool_metrics.record_wait(time.perf_counter() - started)
+
+
+def _register_pool_events(pool):
+    event.listen(pool, "checkout", lambda *args: pool_metrics.increment("checkouts"))
+    event.listen(pool, "checkin", lambda *args: pool_metrics.increment("checkins"))
+    event.listen(pool, "connect", lambda *args: pool_metrics.increment("connects"))
+    event.listen(pool, "invalidate", lambda *args: pool_metrics.increment("invalidations"))
+
 
 # Create SQLAlchemy engine
-engine = create_engine(DATABASE_URL)
+def create_pooled_engine(url=DATABASE_URL, **overrides):
+    options = {**pool_config, **overrides}
+    if url.startswith("sqlite") and ":memory:" in url:
+        # A private in-memory database per connection cannot be pooled meaningfully
+        memory_engine = create_engine(url, connect_args={"check_same_thread": False})
+        metrics.instrument_engine(memory_engine)
+        return memory_engine
+    connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+    pooled_engine = create_engine(url, poolclass=InstrumentedQueuePool, connect_args=connect_args, **options)
+    _register_pool_events(pooled_engine.pool)
+    metrics.instrument_engine(pooled_engine)
+    return pooled_engine
+
+
+engine = create_pooled_engine()
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -41,12 +142,100 @@ def get_db():
     finally:
         db.close()
 
+
+def get_pool_metrics():
+    return pool_metrics.snapshot(engine.pool)
+
+
+# Optional pure-async engine (needs aiomysql or asyncmy installed); created on first use
+async_engine = None
+AsyncSessionLocal = None
+
+
+def get_async_engine():
+    global async_engine, AsyncSessionLocal
+    if async_engine is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        connect_args = {}
+        if config['ssl_ca'] and ASYNC_DATABASE_URL.startswith("mysql"):
+            connect_args["ssl"] = ssl.create_default_context(cafile=config['ssl_ca'])
+        options = {} if ASYNC_DATABASE_URL.startswith("sqlite") else pool_config
+        async_engine = create_async_engine(ASYNC_DATABASE_URL, connect_args=connect_args, **options)
+        if isinstance(async_engine.sync_engine.pool, QueuePool):
+            _register_pool_events(async_engine.sync_engine.pool)
+        metrics.instrument_engine(async_engine.sync_engine)
+        AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    return async_engine
+
+
+# FastAPI dependency for async routes
+async def get_async_db():
+    get_async_engine()
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# Pool load test: many threads run a short query through the pool and report latency/wait stats
+def run_load_test(threads=32, seconds=10.0, query="SELECT 1", hold=0.0):
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                with engine.connect() as connection:
+                    connection.execute(text(query)).fetchall()
+                    if hold:
+                        time.sleep(hold)
+                with lock:
+                    latencies.append(time.perf_counter() - started)
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+
+    latencies.sort()
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0.0
+
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "throughput_per_sec": round(len(latencies) / seconds, 1),
+        "p50_ms": round(percentile(0.50), 2),
+        "p99_ms": round(percentile(0.99), 2),
+        "pool": get_pool_metrics(),
+    }
+
+
 # Test the connection
 if __name__ == "__main__":
-    try:
-        # Try to connect to the database
-        connection = engine.connect()
-        print("Connection successful!")
-        connection.close()
-    except Exception as e:
-        print(f"Error connecting to the database: {e}")
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Database connection check / pool load test")
+    parser.add_argument("--load-test", action="store_true")
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--hold", type=float, default=0.0, help="seconds to hold each connection")
+    args = parser.parse_args()
+
+    if args.load_test:
+        print(f"Pool config: {pool_config}")
+        print(run_load_test(args.threads, args.seconds, hold=args.hold))
+    else:
+        try:
+            # Try to connect to the database
+            connection = engine.connect()
+            print("Connection successful!")
+            connection.close()
+        except Exception as e:
+            print(f"Error connecting to the database: {e}")
@@ -0,0 +1,52 @@
+import time
+from datetime import datetime
+
+from fastapi import APIRouter
+
+import search_vector
+from database import get_pool_metrics
+from openai_client import chat_client, embedding_client
+from response_cache import response_cache
+
+# Diagnostics routes shared by the sync (main.py) and async (main_async.py) apps
+router = APIRouter(prefix="/diagnostics", tags=["Diagnostics"])
+
+
+def _index_schema_response():
+    schema = search_vector.index_schema
+    loaded_at = schema["loaded_at"]
+    return {
+        "status": "success" if loaded_at else "error",
+        "backend": search_vector.search_backend.name if search_vector.search_backend else None,
+        "fields": schema["fields"],
+        "select_fields": search_vector.get_select_fields() if loaded_at else [],
+        "loaded_at": datetime.fromtimestamp(loaded_at) if loaded_at else None,
+        "age_seconds": round(time.time() - loaded_at, 1) if loaded_at else None,
+        "error": schema["error"],
+    }
+
+
+@router.get("/search-index")
+def get_search_index_schema():
+    return _index_schema_response()
+
+
+@router.post("/search-index/refresh")
+def refresh_search_index_schema():
+    search_vector.refresh_index_schema()
+    return _index_schema_response()
+
+
+@router.get("/db-pool")
+def get_db_pool_metrics():
+    return {"status": "success", "pool": get_pool_metrics()}
+
+
+@router.get("/response-cache")
+def get_response_cache_stats():
+    return {"status": "success", "cache": response_cache.stats()}
+
+
+@router.get("/openai")
+def get_openai_client_stats():
+    return {"status": "success", "embeddings": embedding_client.stats(), "chat": chat_client.stats()}
@@ -0,0 +1,174 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Cache settings (empty EMBEDDING_CACHE_PATH disables the on-disk layer)
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite3")
+EMBEDDING_CACHE_MEMORY_SIZE = int(os.getenv("EMBEDDING_CACHE_MEMORY_SIZE", "1024"))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "100000"))
+# Disk hits buffer their last_access update and write them in one transaction every N hits (or with the next put);
+# the disk tier is trimmed back to EMBEDDING_CACHE_MAX_ENTRIES every N inserts rather than on each one
+EMBEDDING_CACHE_TOUCH_BATCH = int(os.getenv("EMBEDDING_CACHE_TOUCH_BATCH", "64"))
+EMBEDDING_CACHE_EVICT_EVERY = int(os.getenv("EMBEDDING_CACHE_EVICT_EVERY", "256"))
+
+
+# Content-hash key; the model name is part of the key so a model switch never hits old vectors
+def make_key(model, text):
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """In-process LRU in front of a SQLite store shared by all workers on the host."""
+
+    def __init__(self, path=EMBEDDING_CACHE_PATH, memory_size=EMBEDDING_CACHE_MEMORY_SIZE,
+                 max_entries=EMBEDDING_CACHE_MAX_ENTRIES, touch_batch=EMBEDDING_CACHE_TOUCH_BATCH,
+                 evict_every=EMBEDDING_CACHE_EVICT_EVERY):
+        self.path = path
+        self.memory_size = memory_size
+        self.max_entries = max_entries
+        self.touch_batch = touch_batch
+        self.evict_every = evict_every
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._touched = {}
+        self._inserts_since_evict = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.memory_evictions = 0
+        self.disk_evictions = 0
+        if path:
+            try:
+                self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS embedding_cache ("
+                    " key TEXT PRIMARY KEY,"
+                    " model TEXT NOT NULL,"
+                    " vector BLOB NOT NULL,"
+                    " last_access REAL NOT NULL)"
+                )
+                self._conn.execute(
+                    "CREATE INDEX IF NOT EXISTS ix_embedding_cache_last_access"
+                    " ON embedding_cache (last_access)"
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                print(f"Embedding cache disabled on disk: {str(e)}")
+                self._conn = None
+
+    def get(self, model, text):
+        key = make_key(model, text)
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return vector.tolist()
+
+            if self._conn is not None:
+                try:
+                    row = self._conn.execute(
+                        "SELECT vector FROM embedding_cache WHERE key = ?", (key,)
+                    ).fetchone()
+                    if row is not None:
+                        self._touched[key] = time.time()
+                        if len(self._touched) >= self.touch_batch:
+                            self._flush_touched()
+                            self._conn.commit()
+                        vector = np.frombuffer(row[0], dtype=np.float32)
+                        self._remember(key, vector)
+                        self.disk_hits += 1
+                        return vector.tolist()
+                except sqlite3.Error as e:
+                    print(f"Embedding cache read error: {str(e)}")
+
+            self.misses += 1
+            return None
+
+    def put(self, model, text, embedding):
+        key = make_key(model, text)
+        vector = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            self._remember(key, vector)
+            if self._conn is None:
+                return
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO embedding_cache (key, model, vector, last_access)"
+                    " VALUES (?, ?, ?, ?)",
+                    (key, model, vector.tobytes(), time.time()),
+                )
+                self._touched.pop(key, None)
+                self._flush_touched()
+                self._inserts_since_evict += 1
+                if self._inserts_since_evict >= self.evict_every:
+                    self._inserts_since_evict = 0
+                    self._evict_disk()
+                self._conn.commit()
+            except sqlite3.Error as e:
+                print(f"Embedding cache write error: {str(e)}")
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._touched.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM embedding_cache")
+                self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            disk_entries = None
+            if self._conn is not None:
+                self._flush_touched()
+                self._conn.commit()
+                disk_entries = self._conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "memory_evictions": self.memory_evictions,
+                "disk_evictions": self.disk_evictions,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+            }
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+            self.memory_evictions += 1
+
+    # Write buffered last_access times (the caller commits)
+    def _flush_touched(self):
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE embedding_cache SET last_access = ? WHERE key = ?",
+                [(accessed_at, key) for key, accessed_at in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def _evict_disk(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM embedding_cache WHERE key IN ("
+                " SELECT key FROM embedding_cache ORDER BY last_access LIMIT ?)",
+                (overflow,),
+            )
+            self.disk_evictions += overflow
+
+
+embedding_cache = EmbeddingCache()
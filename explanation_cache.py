@@ -0,0 +1,69 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Cache settings (entries expire after EXPLANATION_CACHE_TTL seconds)
+EXPLANATION_CACHE_SIZE = int(os.getenv("EXPLANATION_CACHE_SIZE", "5000"))
+EXPLANATION_CACHE_TTL = float(os.getenv("EXPLANATION_CACHE_TTL", str(7 * 24 * 3600)))
+
+
+# Explanations are generated at temperature 0.0, so the prompt inputs plus deployment fully determine them
+def make_key(deployment, query_text, title, research_field, keywords):
+    payload = "\0".join(str(value or "") for value in (deployment, query_text, title, research_field, keywords))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ExplanationCache:
+    """Size-bounded LRU of generated explanations with a per-entry TTL."""
+
+    def __init__(self, max_size=EXPLANATION_CACHE_SIZE, ttl=EXPLANATION_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, explanation = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return explanation
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, explanation):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, explanation)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+            }
+
+
+explanation_cache = ExplanationCache()
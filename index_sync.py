@@ -0,0 +1,284 @@
+import hashlib
+import os
+import sqlite3
+import time
+
+from dotenv import load_dotenv
+
+import models
+from database import SessionLocal
+from search_vector import get_embeddings, search_client, EMBEDDING_MODEL, LOCAL_INDEX_PATH
+from vector_index import LocalVectorIndex, VECTOR_FIELD
+
+load_dotenv()
+
+# Sync state file (content hash per indexed document + resume checkpoint)
+INDEX_SYNC_STATE_PATH = os.getenv("INDEX_SYNC_STATE_PATH", "index_sync_state.sqlite3")
+INDEX_SYNC_BATCH_SIZE = int(os.getenv("INDEX_SYNC_BATCH_SIZE", "500"))
+# Azure AI Search accepts at most 1000 documents (and 16MB) per indexing request
+AZURE_UPLOAD_BATCH_SIZE = 100
+
+
+# One index document per research_project row, with its researcher's fields
+def document_text(document):
+    return " ".join(filter(None, [
+        document["research_field_pi"],
+        document["keywords_pi"],
+        document["research_project_title"],
+    ]))
+
+
+# The embedding model is part of the hash so a model switch re-embeds everything
+def content_hash(document):
+    payload = "\0".join([EMBEDDING_MODEL] + [str(document.get(field) or "") for field in (
+        "researcher_id", "research_field_pi", "keywords_pi", "research_project_title",
+    )])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# Documents ordered by research_project_id, one keyset-paginated query per batch_size rows.
+# mysql-connector buffers whole result sets (no server-side cursors), so a single yield_per query
+# would still pull the entire join into memory before the first row.
+def iter_documents(db, after_project_id=0, batch_size=INDEX_SYNC_BATCH_SIZE):
+    last_project_id = after_project_id
+    while True:
+        rows = (
+            db.query(
+                models.ResearchProject.research_project_id,
+                models.ResearchProject.researcher_id,
+                models.ResearchProject.research_project_title,
+                models.ResearcherInformation.research_field_pi,
+                models.ResearcherInformation.keywords_pi,
+            )
+            .join(
+                models.ResearcherInformation,
+                models.ResearchProject.researcher_id == models.ResearcherInformation.researcher_id,
+            )
+            .filter(models.ResearchProject.research_project_id > last_project_id)
+            .order_by(models.ResearchProject.research_project_id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            return
+        last_project_id = rows[-1].research_project_id
+        for row in rows:
+            yield {
+                "id": str(row.research_project_id),
+                "researcher_id": row.researcher_id,
+                "research_field_pi": row.research_field_pi,
+                "keywords_pi": row.keywords_pi,
+                "research_project_title": row.research_project_title,
+            }
+
+
+class AzureIndexSink:
+    # Writes are visible as soon as each request returns, so every batch is a checkpoint
+    checkpoint_every = 1
+
+    def __init__(self, client=search_client):
+        self.client = client
+
+    def upsert(self, documents, vectors):
+        payload = [
+            {**document, VECTOR_FIELD: vector.tolist()}
+            for document, vector in zip(documents, vectors)
+        ]
+        for start in range(0, len(payload), AZURE_UPLOAD_BATCH_SIZE):
+            self.client.merge_or_upload_documents(documents=payload[start:start + AZURE_UPLOAD_BATCH_SIZE])
+
+    def delete(self, ids):
+        ids = list(ids)
+        for start in range(0, len(ids), AZURE_UPLOAD_BATCH_SIZE):
+            self.client.delete_documents(documents=[{"id": i} for i in ids[start:start + AZURE_UPLOAD_BATCH_SIZE]])
+
+    def flush(self, final=False):
+        pass
+
+
+class LocalIndexSink:
+    # Saving rewrites the whole matrix, so checkpoint every few batches instead of every one
+    checkpoint_every = 20
+
+    # With a state, "the index had IVF lists" is persisted so a run that crashes after a checkpoint
+    # save dropped <path>.ivf.npz still rebuilds them when it is resumed
+    def __init__(self, path=LOCAL_INDEX_PATH, state=None):
+        self.path = path
+        self.state = state
+        self.rebuild_ivf = os.path.exists(f"{path}.ivf.npz") or bool(state and state.get_flag("rebuild_ivf"))
+        if state is not None and self.rebuild_ivf:
+            state.set_flag("rebuild_ivf", True)
+        self.dirty = False
+        if os.path.exists(f"{path}.npy"):
+            self.index = LocalVectorIndex.load(path)
+        else:
+            self.index = LocalVectorIndex.from_vectors([], [])
+
+    def upsert(self, documents, vectors):
+        self.index.upsert(documents, vectors)
+        self.dirty = True
+
+    def delete(self, ids):
+        count = len(self.index)
+        self.index.delete(ids)
+        self.dirty = self.dirty or len(self.index) != count
+
+    def flush(self, final=False):
+        if final and self.rebuild_ivf and len(self.index) and self.index.centroids is None:
+            self.index.build_ivf()
+            self.dirty = True
+        # Nothing changed since the last save: leave the files (and their mtimes) alone
+        if self.dirty:
+            self.index.save(self.path)
+            self.dirty = False
+        if final and self.state is not None:
+            self.state.set_flag("rebuild_ivf", False)
+
+
+class SyncState:
+    """Per-document content hashes and the resume checkpoint, kept in a local SQLite file."""
+
+    def __init__(self, path=INDEX_SYNC_STATE_PATH):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS document_state ("
+            " id TEXT PRIMARY KEY, hash TEXT NOT NULL, seen_run INTEGER NOT NULL)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS sync_run ("
+            " run_id INTEGER PRIMARY KEY, last_project_id INTEGER NOT NULL,"
+            " started_at REAL NOT NULL, finished_at REAL)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS sync_flag (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+        )
+        self.conn.commit()
+
+    def get_flag(self, name):
+        row = self.conn.execute("SELECT value FROM sync_flag WHERE name = ?", (name,)).fetchone()
+        return bool(row and row[0])
+
+    def set_flag(self, name, value):
+        self.conn.execute(
+            "INSERT INTO sync_flag (name, value) VALUES (?, ?)"
+            " ON CONFLICT(name) DO UPDATE SET value = excluded.value",
+            (name, int(value)),
+        )
+        self.conn.commit()
+
+    # Resume the latest unfinished run, or start a new one
+    def start_run(self):
+        row = self.conn.execute(
+            "SELECT run_id, last_project_id FROM sync_run WHERE finished_at IS NULL"
+            " ORDER BY run_id DESC LIMIT 1"
+        ).fetchone()
+        if row:
+            return row
+        cursor = self.conn.execute(
+            "INSERT INTO sync_run (last_project_id, started_at) VALUES (0, ?)", (time.time(),)
+        )
+        self.conn.commit()
+        return cursor.lastrowid, 0
+
+    def hashes(self, ids):
+        placeholders = ",".join("?" * len(ids))
+        rows = self.conn.execute(
+            f"SELECT id, hash FROM document_state WHERE id IN ({placeholders})", list(ids)
+        )
+        return dict(rows.fetchall())
+
+    def mark(self, run_id, documents, hashes):
+        self.conn.executemany(
+            "INSERT INTO document_state (id, hash, seen_run) VALUES (?, ?, ?)"
+            " ON CONFLICT(id) DO UPDATE SET hash = excluded.hash, seen_run = excluded.seen_run",
+            [(document["id"], hashes[document["id"]], run_id) for document in documents],
+        )
+
+    def checkpoint(self, run_id, last_project_id):
+        self.conn.execute(
+            "UPDATE sync_run SET last_project_id = ? WHERE run_id = ?", (last_project_id, run_id)
+        )
+        self.conn.commit()
+
+    def stale_ids(self, run_id):
+        rows = self.conn.execute("SELECT id FROM document_state WHERE seen_run != ?", (run_id,))
+        return [row[0] for row in rows]
+
+    def finish_run(self, run_id, deleted_ids):
+        self.conn.executemany("DELETE FROM document_state WHERE id = ?", [(i,) for i in deleted_ids])
+        self.conn.execute("UPDATE sync_run SET finished_at = ? WHERE run_id = ?", (time.time(), run_id))
+        self.conn.commit()
+
+    def reset(self):
+        self.conn.execute("DELETE FROM document_state")
+        self.conn.execute("DELETE FROM sync_run")
+        self.conn.commit()
+
+
+# Re-embed and push only new/changed documents, then delete documents whose rows are gone.
+# Progress is checkpointed whenever the sink is flushed so a crashed run resumes where it stopped.
+def sync_index(sink, state, batch_size=INDEX_SYNC_BATCH_SIZE, db=None):
+    run_id, last_project_id = state.start_run()
+    if last_project_id:
+        print(f"Resuming sync run {run_id} after research_project_id {last_project_id}")
+
+    own_session = db is None
+    db = db or SessionLocal()
+    stats = {"scanned": 0, "upserted": 0, "deleted": 0}
+    pending_batches = 0
+
+    def sync_batch(batch):
+        nonlocal pending_batches
+        hashes = {document["id"]: content_hash(document) for document in batch}
+        known = state.hashes(list(hashes))
+        changed = [document for document in batch if known.get(document["id"]) != hashes[document["id"]]]
+        if changed:
+            vectors = get_embeddings([document_text(document) for document in changed])
+            sink.upsert(changed, vectors)
+        state.mark(run_id, batch, hashes)
+        stats["scanned"] += len(batch)
+        stats["upserted"] += len(changed)
+        pending_batches += 1
+        if pending_batches >= sink.checkpoint_every:
+            sink.flush()
+            state.checkpoint(run_id, int(batch[-1]["id"]))
+            pending_batches = 0
+        print(f"Synced {stats['scanned']} documents ({stats['upserted']} re-embedded)")
+
+    try:
+        batch = []
+        for document in iter_documents(db, last_project_id, batch_size):
+            batch.append(document)
+            if len(batch) >= batch_size:
+                sync_batch(batch)
+                batch = []
+        if batch:
+            sync_batch(batch)
+    finally:
+        if own_session:
+            db.close()
+
+    deleted_ids = state.stale_ids(run_id)
+    if deleted_ids:
+        sink.delete(deleted_ids)
+    sink.flush(final=True)
+    state.finish_run(run_id, deleted_ids)
+    stats["deleted"] = len(deleted_ids)
+    print(f"Sync run {run_id} finished: {stats}")
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Incrementally sync research projects into the vector index")
+    parser.add_argument("--target", choices=["azure", "local"], default=os.getenv("SEARCH_BACKEND", "azure"))
+    parser.add_argument("--batch-size", type=int, default=INDEX_SYNC_BATCH_SIZE)
+    parser.add_argument("--full", action="store_true", help="forget stored hashes and re-embed every row")
+    args = parser.parse_args()
+
+    sync_state = SyncState()
+    if args.full:
+        sync_state.reset()
+    target = LocalIndexSink(state=sync_state) if args.target == "local" else AzureIndexSink()
+    sync_index(target, sync_state, args.batch_size)
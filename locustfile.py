@@ -0,0 +1,100 @@
+import os
+import random
+
+from locust import HttpUser, between, task
+
+from benchmark import CATEGORIES, FAMILY_NAMES, RESEARCH_FIELDS
+
+# Locust scenarios for the same endpoints as benchmark.py, for longer / distributed runs against a started app:
+#   python benchmark.py --prepare-only          # generates data, starts the fakes, prints the app environment
+#   locust -f locustfile.py --host http://127.0.0.1:8000
+# Task weights approximate production traffic: the frontend polls matchings far more often than it searches.
+# BENCH_RESEARCHERS / BENCH_MATCHINGS must match the seeded data (defaults match --scale 1).
+RESEARCHERS = int(os.getenv("BENCH_RESEARCHERS", "2000"))
+MATCHINGS = int(os.getenv("BENCH_MATCHINGS", "10000"))
+
+
+def search_body(**extra):
+    field = random.choice(list(RESEARCH_FIELDS))
+    return {"category": random.choice(CATEGORIES), "field": field,
+            "description": f"{random.choice(RESEARCH_FIELDS[field])} {random.randint(0, 10 ** 9)}", "top_k": 5, **extra}
+
+
+class ResearchApiUser(HttpUser):
+    wait_time = between(0.5, 2.0)
+
+    def on_start(self):
+        self.researcher_id = random.randint(1, RESEARCHERS)
+        self.etags = {}
+
+    # Polling with If-None-Match like the frontend; 304 counts as success
+    @task(20)
+    def matching_information(self):
+        params = {"researcher_id": self.researcher_id, "matching_status": random.choice([0, 1])}
+        headers = {"If-None-Match": self.etags[params["matching_status"]]} if params["matching_status"] in self.etags else {}
+        with self.client.get("/matching-information", params=params, headers=headers,
+                             name="/matching-information", catch_response=True) as response:
+            if response.status_code in (200, 304):
+                self.etags[params["matching_status"]] = response.headers.get("ETag", "")
+                response.success()
+
+    @task(10)
+    def matching_id(self):
+        self.client.get(f"/matching-id/{random.randint(1, MATCHINGS)}", name="/matching-id/{matching_id}")
+
+    @task(5)
+    def researchers(self):
+        self.client.get("/researchers", params={"limit": 20, "after_id": random.randint(0, RESEARCHERS)},
+                        name="/researchers")
+
+    @task(2)
+    def researchers_filtered(self):
+        field = random.choice(list(RESEARCH_FIELDS))
+        self.client.get("/researchers", params={"limit": 20, "research_field": field,
+                                                "keywords": random.choice(RESEARCH_FIELDS[field])},
+                        name="/researchers?research_field")
+
+    @task(3)
+    def search_researcher(self):
+        self.client.get("/search-researcher", params={"name": random.choice(FAMILY_NAMES)[random.randint(0, 2)]},
+                        name="/search-researcher")
+
+    @task(2)
+    def search(self):
+        self.client.post("/search", json=search_body(), name="/search")
+
+    @task(1)
+    def search_hybrid(self):
+        self.client.post("/search", json=search_body(mode="hybrid", research_field=random.choice(list(RESEARCH_FIELDS))),
+                         name="/search (hybrid)")
+
+    @task(1)
+    def search_grouped(self):
+        self.client.post("/search", json=search_body(aggregation="max"), name="/search (grouped)")
+
+    @task(2)
+    def update_status(self):
+        self.client.patch(f"/matching-status/{random.randint(1, MATCHINGS)}", params={"new_status": random.randint(0, 2)},
+                          name="/matching-status/{matching_id}")
+
+    # Unread badges on the matching list, the open thread and an occasional reply
+    @task(10)
+    def unread_counts(self):
+        self.client.get("/matching-unread-counts", params={"researcher_id": self.researcher_id},
+                        name="/matching-unread-counts")
+
+    @task(5)
+    def messages(self):
+        self.client.get(f"/matching-messages/{random.randint(1, MATCHINGS)}", params={"limit": 50},
+                        name="/matching-messages/{matching_id}")
+
+    @task(1)
+    def post_message(self):
+        self.client.post(f"/matching-messages/{random.randint(1, MATCHINGS)}",
+                         json={"message_content": f"locust {random.randint(0, 10 ** 9)}", "sender_classification": 1},
+                         name="/matching-messages/{matching_id} (post)")
+
+    @task(1)
+    def update_status_bulk(self):
+        self.client.patch("/matching-status", json={"matching_ids": random.sample(range(1, MATCHINGS + 1), 20),
+                                                    "new_status": random.randint(0, 2)}, name="/matching-status")
@@ -1,12 +1,36 @@
-from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi import FastAPI, Depends, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List
+from contextlib import asynccontextmanager
+import json
+import threading
 from sqlalchemy.orm import Session
 from database import get_db, engine, Base
+import diagnostics
+import matching
+import message_events
+import metrics
 import models
+import name_search
+import queries
+import search_vector
+from response_cache import response_cache, researcher_tag, matching_tag
 
-app = FastAPI(title="Research API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 検索インデックスのスキーマを起動時に一度だけ取得してキャッシュ
+    search_vector.refresh_index_schema()
+    # 研究者氏名索引はバックグラウンドで構築（初回検索の待ち時間を避ける）
+    threading.Thread(target=name_search.warm_name_index, daemon=True).start()
+    yield
+
+
+app = FastAPI(title="Research API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -19,120 +43,126 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
 
 @app.get("/")
 def read_root():
     return {"Hello": "World"}
 
 
+# 全件エクスポート用：researcher_id のキーセットで EXPORT_PAGE_SIZE 件ずつ取得し NDJSON を出力
+# （mysql-connector は結果を全件バッファするため、1クエリの yield_per ではメモリを抑えられない）
+def _stream_researchers(bind, research_field, keywords, after_id):
+    while True:
+        stmt = queries.researcher_list_select(research_field, keywords, after_id)
+        # ページごとに別セッション：クライアントの読み出し待ちの間は接続をプールに返す
+        with Session(bind=bind) as db:
+            researchers = db.execute(stmt.limit(queries.EXPORT_PAGE_SIZE)).all()
+        if not researchers:
+            return
+        after_id = researchers[-1].researcher_id
+        for r in researchers:
+            yield json.dumps(jsonable_encoder(queries.researcher_item(r)), ensure_ascii=False) + "\n"
+
+
 # Researcher取得
 @app.get("/researchers", tags=["Researchers"])
-def get_researchers(db: Session = Depends(get_db)):
-    researchers = db.query(models.ResearcherInformation).limit(10).all()
-    result = []
-    for r in researchers:
-        result.append({
-            "researcher_id": r.researcher_id,
-            "researcher_name": r.researcher_name,
-            "position": r.researcher_position_current,
-            "research_field": r.research_field_pi,
-            "keywords": r.keywords_pi,
-        })
-    return {"status": "success", "researchers": result}
+def get_researchers(
+    limit: int = Query(10, ge=1, le=100, description="取得件数"),
+    after_id: int = Query(None, description="前ページの next_cursor（この研究者IDより後を取得）"),
+    research_field: str = Query(None, description="研究分野（部分一致）"),
+    keywords: List[str] = Query(None, description="キーワード（すべて部分一致）"),
+    format: str = Query("json", pattern="^(json|ndjson)$", description="ndjson で全件をストリーミング出力"),
+    db: Session = Depends(get_db)
+):
+    if format == "ndjson":
+        return StreamingResponse(
+            _stream_researchers(db.get_bind(), research_field, keywords, after_id),
+            media_type="application/x-ndjson",
+        )
+
+    stmt = queries.researcher_list_select(research_field, keywords, after_id)
+    researchers = db.execute(stmt.limit(limit + 1)).all()
+
+    next_cursor = researchers[limit - 1].researcher_id if len(researchers) > limit else None
+    result = [queries.researcher_item(r) for r in researchers[:limit]]
+    return {"status": "success", "researchers": result, "next_cursor": next_cursor}
 
 
 @app.get("/search-researcher")
-def search_researcher(name: str, db: Session = Depends(get_db)):
-    researchers = db.query(models.ResearcherInformation).filter(
-        models.ResearcherInformation.researcher_name.ilike(f"%{name}%")
-    ).all()
+def search_researcher(
+    name: str,
+    limit: int = Query(20, ge=1, le=100, description="取得件数"),
+    cursor: str = Query(None, description="前ページの next_cursor"),
+    db: Session = Depends(get_db)
+):
+    # 氏名・カナ・英字表記のバイグラム索引で検索し、一致度順にキーセットページング
+    try:
+        page, next_cursor = name_search.get_name_index(db).search(name, limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
-    if not researchers:
+    if not page:
         return {"status": "not_found"}
 
+    ids = [researcher_id for _, researcher_id in page]
+    by_id = {r.researcher_id: r for r in db.execute(queries.researcher_summary_select(ids))}
+
     return {
         "status": "success",
         "researchers": [
-            {
-                "researcher_id": r.researcher_id,
-                "researcher_name": r.researcher_name,
-                "researcher_affiliation_current": r.researcher_affiliation_current,
-                "researcher_department_current": r.researcher_department_current,
-            }
-            for r in researchers
-        ]
+            queries.researcher_summary_item(by_id[researcher_id]) for researcher_id in ids if researcher_id in by_id
+        ],
+        "next_cursor": next_cursor,
     }
 
+
+# ベクトル検索（研究者候補と推薦理由）
+@app.post("/search", tags=["Search"])
+def search(request: queries.SearchRequest):
+    results = search_vector.search_researchers(
+        request.category, request.field, request.description, top_k=request.top_k, explain=request.explain,
+        mode=request.mode, filters=request.filters(),
+        aggregation=request.aggregation, aggregation_top_n=request.aggregation_top_n
+    )
+    return {"status": "success", "results": results, "total": len(results)}
+
+
+# フロントエンドのポーリング対象：レスポンスをキャッシュし、ETag一致時は304を返す
 @app.get("/matching-information", tags=["Matching"])
 def get_matching(
+    request: Request,
     researcher_id: int = Query(..., description="研究者ID"),
     matching_status: int = Query(..., description="マッチングステータス"),
     db: Session = Depends(get_db)
 ):
-    matchings = db.query(models.MatchingInformation).filter(
-        models.MatchingInformation.researcher_id == researcher_id,
-        models.MatchingInformation.matching_status == matching_status
-    ).all()
-
-    result = []
-    for m in matchings:
-        result.append({
-            "matching_id": m.matching_id,
-            "project_id": m.project_id,
-            "researcher_id": m.researcher_id,
-            #"matching_reason":m.matching_reason,
-            "project_title": m.project.project_title,
-            "consultation_category": m.project.consultation_category,
-            "project_content": m.project.project_content,
-            "research_field": m.project.research_field,
-            #"project_status": m.project.project_status,
-            "application_deadline": m.project.application_deadline,
-            "budget": m.project.budget,
-            #"preferred_researcher_level": m.project.preferred_researcher_level,
-            "company_user_name": m.project.company_user.company_user_name if m.project and m.project.company_user else None,
-            "department": m.project.company_user.department if m.project and m.project.company_user else None,
-            "company_name": m.project.company_user.company.company_name if m.project and m.project.company_user and m.project.company_user.company else None,
-        })
-
-    return {"status": "success", "projects": result, "total": len(result)}
+    def build():
+        matchings = db.execute(queries.matching_list_select(researcher_id, matching_status)).all()
+        result = [queries.matching_item(m) for m in matchings]
+        return {"status": "success", "projects": result, "total": len(result)}
+
+    return response_cache.get_or_build(
+        request, "matching-information", {"researcher_id": researcher_id, "matching_status": matching_status},
+        [researcher_tag(researcher_id)], build
+    )
 
 @app.get("/matching-id/{matching_id}", tags=["Matching"])
 def get_project_by_id(
+    request: Request,
     matching_id: int,
     db: Session = Depends(get_db)
 ):
-    matching = db.query(models.MatchingInformation).filter(
-        models.MatchingInformation.matching_id == matching_id
-    ).first()
+    def build():
+        matching = db.execute(queries.matching_detail_select(matching_id)).first()
 
-    if not matching:
-        raise HTTPException(status_code=404, detail="Project not found")
+        if not matching:
+            raise HTTPException(status_code=404, detail="Project not found")
 
-    project = matching.project
-    company_user = project.company_user if project else None
-    company = company_user.company if company_user else None
-
-    result = {
-        "matching_id": matching.matching_id,
-        "project_id": matching.project_id,
-        "researcher_id": matching.researcher_id,
-        "matching_status": matching.matching_status,
-        "matched_date": matching.matched_date,
-        #"matching_reason": matching.matching_reason,
-        "project_title": project.project_title if project else None,
-        "consultation_category": project.consultation_category if project else None,
-        "project_content": project.project_content if project else None,
-        "research_field": project.research_field if project else None,
-        #"project_status": project.project_status if project else None,
-        "application_deadline": project.application_deadline if project else None,
-        "budget": project.budget if project else None,
-        #"preferred_researcher_level": project.preferred_researcher_level if project else None,
-        "company_user_name": company_user.company_user_name if company_user else None,
-        "department": company_user.department if company_user else None,
-        "company_name": company.company_name if company else None
-    }
+        return {"status": "success", "project": queries.matching_detail_item(matching)}
 
-    return {"status": "success", "project": result}
+    return response_cache.get_or_build(
+        request, "matching-id", {"matching_id": matching_id}, [matching_tag(matching_id)], build
+    )
 
 
 @app.patch("/matching-status/{matching_id}", tags=["Matching"])
@@ -151,9 +181,173 @@ def update_matching_status(
     matching.matching_status = new_status
     db.commit()
     db.refresh(matching)
+    # 変更された研究者の一覧とマッチング詳細のキャッシュだけを無効化
+    response_cache.invalidate([researcher_tag(matching.researcher_id), matching_tag(matching_id)])
 
     return {"status": "success", "matching_id": matching_id, "new_status": new_status}
 
+
+# 案件の条件で研究者を検索し、結果から推薦理由付きのマッチングを1回の INSERT で一括作成
+# （同じ案件と既にマッチング済みの研究者はスキップ）
+@app.post("/matching-information", tags=["Matching"])
+def create_matchings(
+    request: queries.MatchingCreateRequest,
+    db: Session = Depends(get_db)
+):
+    if db.get(models.ProjectInformation, request.project_id) is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    results = search_vector.search_researchers(
+        request.category, request.field, request.description, top_k=request.top_k, explain=request.explain,
+        mode=request.mode, filters=request.filters(),
+        aggregation=request.aggregation, aggregation_top_n=request.aggregation_top_n
+    )
+    created = matching.create_matchings(db, request.project_id, request.query_text(), results)
+    return queries.matching_create_response(request.project_id, results, created)
+
+
+# 複数マッチングのステータスを1トランザクション・1回のUPDATEで変更し、IDごとの結果を返す
+@app.patch("/matching-status", tags=["Matching"])
+def update_matching_statuses(
+    request: queries.MatchingStatusBulkRequest,
+    db: Session = Depends(get_db)
+):
+    rows = db.execute(queries.matching_status_select(request.matching_ids)).all()
+    results, changed = queries.matching_status_outcomes(request.matching_ids, rows, request.new_status)
+    if changed:
+        db.execute(queries.matching_status_update([row.matching_id for row in changed], request.new_status))
+    db.commit()
+
+    response_cache.invalidate(
+        {researcher_tag(row.researcher_id) for row in changed} | {matching_tag(row.matching_id) for row in changed}
+    )
+    return {
+        "status": "success",
+        "new_status": request.new_status,
+        "updated": len(changed),
+        "results": results,
+    }
+
+
+# ロングポーリング/SSE 用：取得ごとに短いセッションを使い、待機中はDB接続を保持しない
+def _fetch_messages(bind, stmt):
+    with Session(bind=bind) as db:
+        return db.execute(stmt).all()
+
+
+# メッセージ履歴：(post_datetime, message_id) のキーセットで新しい順にページング（messages は古い順）。
+# since 指定時はそのカーソルより新しいメッセージだけを返し、新着がなければ最大 wait 秒待つ（ロングポーリング）
+@app.get("/matching-messages/{matching_id}", tags=["Messages"])
+async def get_matching_messages(
+    request: Request,
+    matching_id: int,
+    limit: int = Query(50, ge=1, le=200, description="取得件数"),
+    before: str = Query(None, description="前ページの next_cursor（これより古いメッセージを取得）"),
+    since: str = Query(None, description="latest_cursor（これより新しいメッセージのみ取得）"),
+    wait: float = Query(0, ge=0, le=message_events.MESSAGE_WAIT_MAX, description="since 指定時の最大待機秒数"),
+    db: Session = Depends(get_db)
+):
+    if before and since:
+        raise HTTPException(status_code=400, detail="before and since cannot be combined")
+    try:
+        if since:
+            stmt = queries.message_since_select(matching_id, since)
+        else:
+            stmt = queries.message_history_select(matching_id, before)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    bind = db.get_bind()
+
+    async def fetch():
+        return await run_in_threadpool(_fetch_messages, bind, stmt.limit(limit + 1))
+
+    rows = await message_events.poll_messages(matching_id, fetch, wait if since else 0, request.is_disconnected)
+    return queries.message_page(rows, limit, since)
+
+
+# 新着メッセージを Server-Sent Events で配信（Last-Event-ID または since から再開、未指定なら接続時点以降）
+@app.get("/matching-messages/{matching_id}/events", tags=["Messages"])
+async def stream_matching_messages(
+    request: Request,
+    matching_id: int,
+    since: str = Query(None, description="latest_cursor（これより新しいメッセージから配信）"),
+    db: Session = Depends(get_db)
+):
+    bind = db.get_bind()
+    cursor = request.headers.get("last-event-id") or since
+    if cursor:
+        try:
+            queries.decode_message_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    else:
+        latest = await run_in_threadpool(_fetch_messages, bind, queries.message_history_select(matching_id).limit(1))
+        cursor = queries.message_page(latest, 1)["latest_cursor"]
+
+    async def fetch(after):
+        rows = await run_in_threadpool(_fetch_messages, bind, queries.message_since_select(matching_id, after).limit(100))
+        return [queries.message_item(m) for m in rows]
+
+    return StreamingResponse(
+        message_events.message_stream(matching_id, cursor, fetch, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# メッセージ投稿：待機中のロングポーリング/SSE に通知
+@app.post("/matching-messages/{matching_id}", tags=["Messages"])
+def post_matching_message(
+    matching_id: int,
+    request: queries.MessageCreateRequest,
+    db: Session = Depends(get_db)
+):
+    if db.get(models.MatchingInformation, matching_id) is None:
+        raise HTTPException(status_code=404, detail="Matching not found")
+
+    message = queries.new_message(matching_id, request)
+    db.add(message)
+    db.commit()
+    db.refresh(message)
+    message_events.notify(matching_id)
+    return {"status": "success", "message": queries.message_item(message)}
+
+
+# 既読化：指定した送信者区分のメッセージを up_to のカーソルまで1回の UPDATE で既読にする
+@app.patch("/matching-messages/{matching_id}/read", tags=["Messages"])
+def mark_matching_messages_read(
+    matching_id: int,
+    sender_classification: int = Query(None, description="既読にするメッセージの送信者区分"),
+    up_to: str = Query(None, description="このカーソルまでを既読にする（未指定なら全件）"),
+    db: Session = Depends(get_db)
+):
+    try:
+        stmt = queries.message_read_update(matching_id, sender_classification, up_to)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    updated = db.execute(stmt).rowcount
+    db.commit()
+    return {"status": "success", "matching_id": matching_id, "updated": updated}
+
+
+# マッチングごとの未読件数を1回の集計クエリで取得（研究者のマッチング全体、または matching_ids 指定）
+@app.get("/matching-unread-counts", tags=["Messages"])
+def get_matching_unread_counts(
+    researcher_id: int = Query(None, description="研究者ID"),
+    matching_ids: List[int] = Query(None, description="マッチングID"),
+    sender_classification: int = Query(None, description="数える送信者区分（相手側のメッセージのみ数える場合）"),
+    db: Session = Depends(get_db)
+):
+    if researcher_id is None and not matching_ids:
+        raise HTTPException(status_code=400, detail="researcher_id or matching_ids is required")
+    rows = db.execute(queries.message_unread_count_select(researcher_id, matching_ids, sender_classification)).all()
+    return queries.message_unread_counts(rows)
+
+
+app.include_router(diagnostics.router)
+app.include_router(metrics.router)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,352 @@
+import asyncio
+import json
+import threading
+from contextlib import asynccontextmanager
+from typing import List
+
+from fastapi import FastAPI, Depends, HTTPException, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import async_search
+import database
+import diagnostics
+import matching
+import message_events
+import metrics
+import models
+import name_search
+import queries
+import search_vector
+from database import get_async_db
+from response_cache import response_cache, researcher_tag, matching_tag
+
+# Async variant of main.py: AsyncSession for MySQL, aiohttp for Azure OpenAI and the aio Azure Search client.
+# Run with: uvicorn main_async:app
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    database.get_async_engine()
+    await asyncio.to_thread(search_vector.refresh_index_schema)
+    threading.Thread(target=name_search.warm_name_index, daemon=True).start()
+    yield
+    await async_search.close_http_client()
+    if search_vector.async_search_client is not None:
+        await search_vector.async_search_client.close()
+    await database.async_engine.dispose()
+
+
+app = FastAPI(title="Research API (async)", lifespan=lifespan)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=[
+        "https://app-advanced3-4-aygnfjh3hxbyducf.canadacentral-01.azurewebsites.net",
+        "http://localhost:3000",
+        "http://0.0.0.0:8000",
+    ],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+app.add_middleware(metrics.MetricsMiddleware)
+
+
+@app.get("/")
+async def read_root():
+    return {"Hello": "World"}
+
+
+# 全件エクスポート用：researcher_id のキーセットで EXPORT_PAGE_SIZE 件ずつ取得し NDJSON を出力
+# （同期版と同じ方式。クライアントの読み出し待ちの間は接続をプールに返す）
+async def _stream_researchers(research_field, keywords, after_id):
+    while True:
+        stmt = queries.researcher_list_select(research_field, keywords, after_id)
+        async with database.AsyncSessionLocal() as db:
+            researchers = (await db.execute(stmt.limit(queries.EXPORT_PAGE_SIZE))).all()
+        if not researchers:
+            return
+        after_id = researchers[-1].researcher_id
+        for r in researchers:
+            yield json.dumps(jsonable_encoder(queries.researcher_item(r)), ensure_ascii=False) + "\n"
+
+
+@app.get("/researchers", tags=["Researchers"])
+async def get_researchers(
+    limit: int = Query(10, ge=1, le=100, description="取得件数"),
+    after_id: int = Query(None, description="前ページの next_cursor（この研究者IDより後を取得）"),
+    research_field: str = Query(None, description="研究分野（部分一致）"),
+    keywords: List[str] = Query(None, description="キーワード（すべて部分一致）"),
+    format: str = Query("json", pattern="^(json|ndjson)$", description="ndjson で全件をストリーミング出力"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    if format == "ndjson":
+        return StreamingResponse(
+            _stream_researchers(research_field, keywords, after_id),
+            media_type="application/x-ndjson",
+        )
+
+    stmt = queries.researcher_list_select(research_field, keywords, after_id)
+    researchers = (await db.execute(stmt.limit(limit + 1))).all()
+
+    next_cursor = researchers[limit - 1].researcher_id if len(researchers) > limit else None
+    result = [queries.researcher_item(r) for r in researchers[:limit]]
+    return {"status": "success", "researchers": result, "next_cursor": next_cursor}
+
+
+@app.get("/search-researcher")
+async def search_researcher(
+    name: str,
+    limit: int = Query(20, ge=1, le=100, description="取得件数"),
+    cursor: str = Query(None, description="前ページの next_cursor"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    try:
+        # 初回の索引構築は同期セッションで別スレッド実行（リクエストの接続を占有しない）
+        index = await asyncio.to_thread(name_search.load_name_index)
+        page, next_cursor = index.search(name, limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if not page:
+        return {"status": "not_found"}
+
+    ids = [researcher_id for _, researcher_id in page]
+    by_id = {r.researcher_id: r for r in await db.execute(queries.researcher_summary_select(ids))}
+
+    return {
+        "status": "success",
+        "researchers": [
+            queries.researcher_summary_item(by_id[researcher_id]) for researcher_id in ids if researcher_id in by_id
+        ],
+        "next_cursor": next_cursor,
+    }
+
+
+# ベクトル検索（研究者候補と推薦理由）
+@app.post("/search", tags=["Search"])
+async def search(request: queries.SearchRequest):
+    results = await async_search.search_researchers_async(
+        request.category, request.field, request.description, top_k=request.top_k, explain=request.explain,
+        mode=request.mode, filters=request.filters(),
+        aggregation=request.aggregation, aggregation_top_n=request.aggregation_top_n
+    )
+    return {"status": "success", "results": results, "total": len(results)}
+
+
+@app.get("/matching-information", tags=["Matching"])
+async def get_matching(
+    request: Request,
+    researcher_id: int = Query(..., description="研究者ID"),
+    matching_status: int = Query(..., description="マッチングステータス"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    async def build():
+        matchings = (await db.execute(queries.matching_list_select(researcher_id, matching_status))).all()
+        result = [queries.matching_item(m) for m in matchings]
+        return {"status": "success", "projects": result, "total": len(result)}
+
+    return await response_cache.aget_or_build(
+        request, "matching-information", {"researcher_id": researcher_id, "matching_status": matching_status},
+        [researcher_tag(researcher_id)], build
+    )
+
+
+@app.get("/matching-id/{matching_id}", tags=["Matching"])
+async def get_project_by_id(
+    request: Request,
+    matching_id: int,
+    db: AsyncSession = Depends(get_async_db)
+):
+    async def build():
+        matching = (await db.execute(queries.matching_detail_select(matching_id))).first()
+
+        if not matching:
+            raise HTTPException(status_code=404, detail="Project not found")
+
+        return {"status": "success", "project": queries.matching_detail_item(matching)}
+
+    return await response_cache.aget_or_build(
+        request, "matching-id", {"matching_id": matching_id}, [matching_tag(matching_id)], build
+    )
+
+
+@app.patch("/matching-status/{matching_id}", tags=["Matching"])
+async def update_matching_status(
+    matching_id: int,
+    new_status: int = Query(..., description="新しいマッチングステータス"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    matching = await db.get(models.MatchingInformation, matching_id)
+
+    if not matching:
+        raise HTTPException(status_code=404, detail="Matching not found")
+
+    matching.matching_status = new_status
+    researcher_id = matching.researcher_id
+    await db.commit()
+    response_cache.invalidate([researcher_tag(researcher_id), matching_tag(matching_id)])
+
+    return {"status": "success", "matching_id": matching_id, "new_status": new_status}
+
+
+# 案件の条件で研究者を検索し、結果から推薦理由付きのマッチングを1回の INSERT で一括作成
+# （挿入と不足分の推薦理由生成は同期処理のため、専用の同期セッションで別スレッド実行）
+@app.post("/matching-information", tags=["Matching"])
+async def create_matchings(
+    request: queries.MatchingCreateRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    if await db.get(models.ProjectInformation, request.project_id) is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    results = await async_search.search_researchers_async(
+        request.category, request.field, request.description, top_k=request.top_k, explain=request.explain,
+        mode=request.mode, filters=request.filters(),
+        aggregation=request.aggregation, aggregation_top_n=request.aggregation_top_n
+    )
+
+    def create():
+        with database.SessionLocal() as sync_db:
+            return matching.create_matchings(sync_db, request.project_id, request.query_text(), results)
+
+    created = await asyncio.to_thread(create)
+    return queries.matching_create_response(request.project_id, results, created)
+
+
+@app.patch("/matching-status", tags=["Matching"])
+async def update_matching_statuses(
+    request: queries.MatchingStatusBulkRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    rows = (await db.execute(queries.matching_status_select(request.matching_ids))).all()
+    results, changed = queries.matching_status_outcomes(request.matching_ids, rows, request.new_status)
+    if changed:
+        await db.execute(queries.matching_status_update([row.matching_id for row in changed], request.new_status))
+    await db.commit()
+
+    response_cache.invalidate(
+        {researcher_tag(row.researcher_id) for row in changed} | {matching_tag(row.matching_id) for row in changed}
+    )
+    return {
+        "status": "success",
+        "new_status": request.new_status,
+        "updated": len(changed),
+        "results": results,
+    }
+
+
+# ロングポーリング/SSE 用：取得ごとに短いセッションを使い、待機中はDB接続を保持しない
+async def _fetch_messages(stmt):
+    database.get_async_engine()
+    async with database.AsyncSessionLocal() as db:
+        return (await db.execute(stmt)).all()
+
+
+@app.get("/matching-messages/{matching_id}", tags=["Messages"])
+async def get_matching_messages(
+    request: Request,
+    matching_id: int,
+    limit: int = Query(50, ge=1, le=200, description="取得件数"),
+    before: str = Query(None, description="前ページの next_cursor（これより古いメッセージを取得）"),
+    since: str = Query(None, description="latest_cursor（これより新しいメッセージのみ取得）"),
+    wait: float = Query(0, ge=0, le=message_events.MESSAGE_WAIT_MAX, description="since 指定時の最大待機秒数"),
+):
+    if before and since:
+        raise HTTPException(status_code=400, detail="before and since cannot be combined")
+    try:
+        if since:
+            stmt = queries.message_since_select(matching_id, since)
+        else:
+            stmt = queries.message_history_select(matching_id, before)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    rows = await message_events.poll_messages(
+        matching_id, lambda: _fetch_messages(stmt.limit(limit + 1)), wait if since else 0, request.is_disconnected
+    )
+    return queries.message_page(rows, limit, since)
+
+
+@app.get("/matching-messages/{matching_id}/events", tags=["Messages"])
+async def stream_matching_messages(
+    request: Request,
+    matching_id: int,
+    since: str = Query(None, description="latest_cursor（これより新しいメッセージから配信）"),
+):
+    cursor = request.headers.get("last-event-id") or since
+    if cursor:
+        try:
+            queries.decode_message_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    else:
+        latest = await _fetch_messages(queries.message_history_select(matching_id).limit(1))
+        cursor = queries.message_page(latest, 1)["latest_cursor"]
+
+    async def fetch(after):
+        rows = await _fetch_messages(queries.message_since_select(matching_id, after).limit(100))
+        return [queries.message_item(m) for m in rows]
+
+    return StreamingResponse(
+        message_events.message_stream(matching_id, cursor, fetch, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/matching-messages/{matching_id}", tags=["Messages"])
+async def post_matching_message(
+    matching_id: int,
+    request: queries.MessageCreateRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    if await db.get(models.MatchingInformation, matching_id) is None:
+        raise HTTPException(status_code=404, detail="Matching not found")
+
+    message = queries.new_message(matching_id, request)
+    db.add(message)
+    await db.commit()
+    await db.refresh(message)
+    message_events.notify(matching_id)
+    return {"status": "success", "message": queries.message_item(message)}
+
+
+@app.patch("/matching-messages/{matching_id}/read", tags=["Messages"])
+async def mark_matching_messages_read(
+    matching_id: int,
+    sender_classification: int = Query(None, description="既読にするメッセージの送信者区分"),
+    up_to: str = Query(None, description="このカーソルまでを既読にする（未指定なら全件）"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    try:
+        stmt = queries.message_read_update(matching_id, sender_classification, up_to)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    updated = (await db.execute(stmt)).rowcount
+    await db.commit()
+    return {"status": "success", "matching_id": matching_id, "updated": updated}
+
+
+@app.get("/matching-unread-counts", tags=["Messages"])
+async def get_matching_unread_counts(
+    researcher_id: int = Query(None, description="研究者ID"),
+    matching_ids: List[int] = Query(None, description="マッチングID"),
+    sender_classification: int = Query(None, description="数える送信者区分（相手側のメッセージのみ数える場合）"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    if researcher_id is None and not matching_ids:
+        raise HTTPException(status_code=400, detail="researcher_id or matching_ids is required")
+    rows = (await db.execute(queries.message_unread_count_select(researcher_id, matching_ids, sender_classification))).all()
+    return queries.message_unread_counts(rows)
+
+
+app.include_router(diagnostics.router)
+app.include_router(metrics.router)
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,76 @@
+from datetime import datetime
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+import models
+from response_cache import response_cache, researcher_tag
+from search_vector import generate_explanations
+
+
+# Stored when no LLM explanation is available (chat deployment failing or its circuit open)
+def fallback_reason(result):
+    return f"類似研究課題: {result.get('research_project_title') or ''}"
+
+
+# (project_id, researcher_id) pairs that already have a matching row, in one query
+def existing_matchings(db: Session, pairs):
+    pairs = set(pairs)
+    if not pairs:
+        return set()
+    rows = db.execute(
+        select(models.MatchingInformation.project_id, models.MatchingInformation.researcher_id).where(
+            models.MatchingInformation.project_id.in_({project_id for project_id, _ in pairs}),
+            models.MatchingInformation.researcher_id.in_({researcher_id for _, researcher_id in pairs}),
+        )
+    )
+    return {(row.project_id, row.researcher_id) for row in rows} & pairs
+
+
+# Insert prepared matching rows (project_id, researcher_id, matching_reason) with one executemany INSERT
+def insert_matchings(db: Session, rows):
+    if not rows:
+        return
+    now = datetime.now()
+    db.execute(insert(models.MatchingInformation), [
+        {"matching_status": 0, "matched_date": now, **row} for row in rows
+    ])
+    db.commit()
+    response_cache.invalidate({researcher_tag(row["researcher_id"]) for row in rows})
+
+
+# Create matchings for a whole search_researchers result set: one row per researcher
+# (first/best-ranked result wins), researchers already matched to the project are skipped,
+# explanations (cached ones included) are stored as matching_reason so detail views never regenerate them,
+# missing explanations are generated concurrently and the rows go in as one executemany INSERT.
+# Returns the researcher_ids that were inserted.
+def create_matchings(db: Session, project_id, query_text, results):
+    by_researcher = {}
+    for result in results:
+        try:
+            researcher_id = int(result["researcher_id"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        by_researcher.setdefault(researcher_id, result)
+
+    existing = existing_matchings(db, [(project_id, researcher_id) for researcher_id in by_researcher])
+    pending = {rid: result for rid, result in by_researcher.items() if (project_id, rid) not in existing}
+    if not pending:
+        return []
+
+    reasons = {}
+    missing = []
+    for researcher_id, result in pending.items():
+        explanation = result.get("explanation")
+        if explanation:
+            reasons[researcher_id] = explanation
+        else:
+            missing.append(researcher_id)
+    for researcher_id, explanation in zip(missing, generate_explanations(query_text, [pending[rid] for rid in missing])):
+        reasons[researcher_id] = explanation or fallback_reason(pending[researcher_id])
+
+    insert_matchings(db, [
+        {"project_id": project_id, "researcher_id": researcher_id, "matching_reason": reasons[researcher_id]}
+        for researcher_id in pending
+    ])
+    return list(pending)
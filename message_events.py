@@ -0,0 +1,71 @@
+import asyncio
+import json
+import os
+import time
+
+from dotenv import load_dotenv
+from fastapi.encoders import jsonable_encoder
+
+from response_cache import messages_tag, response_cache
+
+load_dotenv()
+
+# Long-poll / SSE delivery of new messages, shared by the sync (main.py) and async (main_async.py) apps.
+# Waiting clients watch the thread's version in the response cache backend (in-process, or Redis so posts on
+# other workers are seen too) and only query the database when it changes, plus a slow fallback query for
+# rows written outside the API.
+MESSAGE_WAIT_MAX = float(os.getenv("MESSAGE_WAIT_MAX", "30"))
+MESSAGE_NOTIFY_INTERVAL = float(os.getenv("MESSAGE_NOTIFY_INTERVAL", "0.5"))
+MESSAGE_DB_POLL_INTERVAL = float(os.getenv("MESSAGE_DB_POLL_INTERVAL", "10"))
+MESSAGE_SSE_HEARTBEAT = float(os.getenv("MESSAGE_SSE_HEARTBEAT", "15"))
+# SSE connections are closed after this long; EventSource reconnects with Last-Event-ID
+MESSAGE_SSE_MAX_SECONDS = float(os.getenv("MESSAGE_SSE_MAX_SECONDS", "300"))
+
+
+def notify(matching_id):
+    response_cache.invalidate([messages_tag(matching_id)])
+
+
+# fetch() -> new message items. Returns as soon as there are any, or [] after `wait` seconds.
+async def poll_messages(matching_id, fetch, wait=0, is_disconnected=None):
+    tag = messages_tag(matching_id)
+    # Read the version before the first query so a message posted in between still wakes us up.
+    # With the Redis backend this is a blocking network call, so it runs off the event loop.
+    version = await asyncio.to_thread(response_cache.tag_version, tag)
+    items = await fetch()
+    if items or wait <= 0:
+        return items
+
+    deadline = time.monotonic() + min(wait, MESSAGE_WAIT_MAX)
+    queried_at = time.monotonic()
+    while time.monotonic() < deadline:
+        await asyncio.sleep(min(MESSAGE_NOTIFY_INTERVAL, deadline - time.monotonic()))
+        if is_disconnected is not None and await is_disconnected():
+            return []
+        current = await asyncio.to_thread(response_cache.tag_version, tag)
+        if current != version or time.monotonic() - queried_at >= MESSAGE_DB_POLL_INTERVAL:
+            version, queried_at = current, time.monotonic()
+            items = await fetch()
+            if items:
+                return items
+    return []
+
+
+def sse_event(item):
+    data = json.dumps(jsonable_encoder(item), ensure_ascii=False)
+    return f"id: {item['cursor']}\nevent: message\ndata: {data}\n\n"
+
+
+# Server-sent events for one thread: fetch(cursor) -> message items after cursor (oldest first)
+async def message_stream(matching_id, cursor, fetch, is_disconnected):
+    yield "retry: 3000\n\n"
+    started = time.monotonic()
+    while time.monotonic() - started < MESSAGE_SSE_MAX_SECONDS:
+        items = await poll_messages(matching_id, lambda: fetch(cursor), MESSAGE_SSE_HEARTBEAT, is_disconnected)
+        if await is_disconnected():
+            return
+        for item in items:
+            cursor = item["cursor"]
+            yield sse_event(item)
+        if not items:
+            yield ": keep-alive\n\n"
@@ -0,0 +1,145 @@
+import time
+from contextvars import ContextVar
+
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from sqlalchemy import event
+
+# Prometheus metrics shared by the sync (main.py) and async (main_async.py) apps.
+# Each uvicorn worker keeps its own registry, so scrape workers individually (or run one worker per container).
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time from request start to the last response byte",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds", "Duration of a single SQL statement", buckets=QUERY_BUCKETS,
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request", "SQL statements executed while serving one request",
+    ["route"], buckets=COUNT_BUCKETS,
+)
+DB_SECONDS_PER_REQUEST = Histogram(
+    "db_time_per_request_seconds", "Total SQL execution time while serving one request",
+    ["route"], buckets=LATENCY_BUCKETS,
+)
+EMBEDDING_SECONDS = Histogram(
+    "embedding_request_duration_seconds", "Azure OpenAI embeddings call (cache misses only)",
+    ["outcome"], buckets=LATENCY_BUCKETS,
+)
+SEARCH_SECONDS = Histogram(
+    "search_backend_duration_seconds", "Vector / hybrid search call to the search backend",
+    ["backend", "mode"], buckets=LATENCY_BUCKETS,
+)
+CHAT_SECONDS = Histogram(
+    "openai_chat_duration_seconds", "Azure OpenAI chat completion call (one explanation)",
+    ["outcome"], buckets=LATENCY_BUCKETS,
+)
+OPENAI_TOKENS = Counter(
+    "openai_tokens", "Tokens reported in Azure OpenAI usage", ["api", "kind"],
+)
+OPENAI_RETRIES = Counter(
+    "openai_retries", "Azure OpenAI attempts retried, by status code or 'connection'", ["api", "reason"],
+)
+OPENAI_RATE_LIMIT_WAIT_SECONDS = Histogram(
+    "openai_rate_limit_wait_seconds", "Time a call waited on the client-side RPM/TPM limiter",
+    ["api"], buckets=LATENCY_BUCKETS,
+)
+OPENAI_CIRCUIT_STATE = Gauge(
+    "openai_circuit_state", "Azure OpenAI circuit breaker state (0 closed, 1 half open, 2 open)", ["api"],
+)
+
+# Per-request SQL counters; the dict is shared with the worker thread / task that runs the endpoint
+_request_stats = ContextVar("request_stats", default=None)
+
+
+def observe_since(histogram, started, **labels):
+    (histogram.labels(**labels) if labels else histogram).observe(time.perf_counter() - started)
+
+
+# Token usage block of an embeddings or chat completions response
+def record_usage(api, usage):
+    if not usage:
+        return
+    for kind in ("prompt_tokens", "completion_tokens"):
+        if usage.get(kind):
+            OPENAI_TOKENS.labels(api=api, kind=kind.removesuffix("_tokens")).inc(usage[kind])
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    DB_QUERY_SECONDS.observe(elapsed)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats["queries"] += 1
+        stats["db_seconds"] += elapsed
+
+
+# SQL timing hooks; pass the sync engine (AsyncEngine.sync_engine for the async app)
+def instrument_engine(engine):
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# Route template for the matched endpoint ("/matching-id/{matching_id}"), never the raw path
+_route_paths = {}
+
+
+def _route_path(scope):
+    endpoint = scope.get("endpoint")
+    if endpoint is None or "app" not in scope:
+        return "unmatched"
+    if endpoint not in _route_paths:
+        _route_paths.update({route.endpoint: route.path for route in scope["app"].routes if hasattr(route, "endpoint")})
+    return _route_paths.get(endpoint, "unmatched")
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware: request latency (until the last body chunk, so streamed responses count fully)
+    and per-request SQL statement count / time, labelled with the route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        stats = {"queries": 0, "db_seconds": 0.0}
+        token = _request_stats.set(stats)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_stats.reset(token)
+            route = _route_path(scope)
+            HTTP_REQUEST_SECONDS.labels(method=scope["method"], route=route, status=str(status)).observe(
+                time.perf_counter() - started
+            )
+            DB_QUERIES_PER_REQUEST.labels(route=route).observe(stats["queries"])
+            DB_SECONDS_PER_REQUEST.labels(route=route).observe(stats["db_seconds"])
+
+
+router = APIRouter(tags=["Diagnostics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
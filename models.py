@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, DECIMAL
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, DECIMAL, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -104,6 +104,11 @@ class MatchingInformation(Base):
 
 class MessageInformation(Base):
     __tablename__ = 'message_information'
+    # スレッドのキーセットページング用と、マッチングごとの未読件数集計用
+    __table_args__ = (
+        Index('ix_message_matching_posted', 'matching_id', 'post_datetime', 'message_id'),
+        Index('ix_message_matching_status', 'matching_id', 'message_status', 'sender_classification'),
+    )
 
     message_id = Column(Integer, primary_key=True, autoincrement=True)
     matching_id = Column(Integer, ForeignKey('matching_information.matching_id'), nullable=False)
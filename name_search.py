@@ -0,0 +1,259 @@
+import os
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+
+import numpy as np
+from dotenv import load_dotenv
+
+import models
+from database import SessionLocal
+
+load_dotenv()
+
+# Rebuild the in-memory index when it is older than NAME_INDEX_TTL seconds
+NAME_INDEX_TTL = float(os.getenv("NAME_INDEX_TTL", "600"))
+NAME_FIELDS = ["researcher_name", "researcher_name_kana", "researcher_name_alphabet"]
+
+# Rank classes: smaller is better
+EXACT, PREFIX, SUBSTRING = 0, 1, 2
+
+
+# NFKC + lower case + no spaces, so "山田 太郎", "山田太郎" and full-width kana/latin all match
+def normalize(text):
+    if not text:
+        return ""
+    return "".join(unicodedata.normalize("NFKC", text).lower().split())
+
+
+# Character bigrams (the same token size as MySQL's ngram full-text parser default)
+def bigrams(text):
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def encode_cursor(rank, researcher_id):
+    return f"{rank}:{researcher_id}"
+
+
+def decode_cursor(cursor):
+    rank, researcher_id = cursor.split(":")
+    return int(rank), int(researcher_id)
+
+
+class NameIndex:
+    """Bigram inverted index over the researcher name columns.
+
+    A query keeps rows containing every query bigram, verifies the substring match
+    and ranks exact > prefix > substring, then researcher_id for a stable keyset order.
+    """
+
+    def __init__(self, researcher_ids, names, postings):
+        self.researcher_ids = researcher_ids
+        self.names = names
+        self.postings = postings
+        self.built_at = time.time()
+
+    @classmethod
+    def build(cls, rows):
+        researcher_ids = []
+        names = []
+        postings = defaultdict(list)
+        for position, row in enumerate(rows):
+            fields = tuple(normalize(row[i + 1]) for i in range(len(NAME_FIELDS)))
+            researcher_ids.append(row[0])
+            names.append(fields)
+            for gram in set().union(*(bigrams(field) for field in fields)):
+                postings[gram].append(position)
+        return cls(
+            np.asarray(researcher_ids, dtype=np.int64),
+            names,
+            {gram: np.asarray(positions, dtype=np.int32) for gram, positions in postings.items()},
+        )
+
+    @classmethod
+    def from_db(cls, db, yield_per=10000):
+        columns = [models.ResearcherInformation.researcher_id] + [
+            getattr(models.ResearcherInformation, field) for field in NAME_FIELDS
+        ]
+        rows = db.query(*columns).order_by(models.ResearcherInformation.researcher_id).yield_per(yield_per)
+        return cls.build(rows)
+
+    def __len__(self):
+        return len(self.names)
+
+    def _candidates(self, query):
+        grams = bigrams(query)
+        if not grams:
+            # Single character: no bigram to look up, scan the normalised names
+            return [p for p, fields in enumerate(self.names) if any(query in field for field in fields)]
+        lists = []
+        for gram in grams:
+            rows = self.postings.get(gram)
+            if rows is None:
+                return []
+            lists.append(rows)
+        lists.sort(key=len)
+        candidates = lists[0]
+        for rows in lists[1:]:
+            candidates = np.intersect1d(candidates, rows, assume_unique=True)
+            if not len(candidates):
+                break
+        return candidates
+
+    # Returns ([(rank, researcher_id), ...], next_cursor)
+    def search(self, name, limit=20, cursor=None):
+        query = normalize(name)
+        if not query:
+            return [], None
+        after = decode_cursor(cursor) if cursor else None
+
+        ranked = []
+        for position in self._candidates(query):
+            fields = self.names[position]
+            if any(field == query for field in fields):
+                rank = EXACT
+            elif any(field.startswith(query) for field in fields):
+                rank = PREFIX
+            elif any(query in field for field in fields):
+                rank = SUBSTRING
+            else:
+                continue
+            key = (rank, int(self.researcher_ids[position]))
+            if after is None or key > after:
+                ranked.append(key)
+
+        ranked.sort()
+        page = ranked[:limit]
+        next_cursor = encode_cursor(*page[-1]) if len(ranked) > limit else None
+        return page, next_cursor
+
+
+_name_index = None
+_build_lock = threading.Lock()
+_rebuilding = threading.Event()
+
+
+def _build(db):
+    started = time.perf_counter()
+    index = NameIndex.from_db(db)
+    print(f"Researcher name index built: {len(index)} rows in {time.perf_counter() - started:.2f}s")
+    return index
+
+
+def _rebuild_in_background():
+    global _name_index
+    db = SessionLocal()
+    try:
+        _name_index = _build(db)
+    except Exception as e:
+        print(f"Error rebuilding researcher name index: {str(e)}")
+    finally:
+        db.close()
+        _rebuilding.clear()
+
+
+# Shared index. The first call builds it; once older than NAME_INDEX_TTL it is rebuilt
+# in a background thread while queries keep using the previous one.
+def get_name_index(db):
+    global _name_index
+    index = _name_index
+    if index is None:
+        with _build_lock:
+            if _name_index is None:
+                _name_index = _build(db)
+            return _name_index
+    if time.time() - index.built_at >= NAME_INDEX_TTL and not _rebuilding.is_set():
+        _rebuilding.set()
+        threading.Thread(target=_rebuild_in_background, daemon=True).start()
+    return index
+
+
+# Index lookup with its own session, for callers outside a sync request (startup, async app worker threads)
+def load_name_index():
+    db = SessionLocal()
+    try:
+        return get_name_index(db)
+    finally:
+        db.close()
+
+
+def warm_name_index():
+    try:
+        load_name_index()
+    except Exception as e:
+        print(f"Error building researcher name index: {str(e)}")
+
+
+# Latency benchmark: ILIKE '%name%' scan vs the bigram index on a synthetic SQLite table
+if __name__ == "__main__":
+    import argparse
+    import random
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    parser = argparse.ArgumentParser(description="Researcher name search benchmark")
+    parser.add_argument("--count", type=int, default=500000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--db", default="sqlite:///name_search_bench.sqlite3")
+    args = parser.parse_args()
+
+    engine = create_engine(args.db)
+    models.Base.metadata.create_all(engine, tables=[models.ResearcherInformation.__table__])
+    Session = sessionmaker(bind=engine)
+    db = Session()
+
+    rng = random.Random(0)
+    family = ["山田", "佐藤", "鈴木", "高橋", "田中", "伊藤", "渡辺", "中村", "小林", "加藤", "吉田", "山本", "松本", "井上", "木村"]
+    given = ["太郎", "花子", "健一", "美咲", "大輔", "陽菜", "翔太", "結衣", "直樹", "彩", "誠", "恵子"]
+    family_kana = ["ヤマダ", "サトウ", "スズキ", "タカハシ", "タナカ", "イトウ", "ワタナベ", "ナカムラ", "コバヤシ", "カトウ", "ヨシダ", "ヤマモト", "マツモト", "イノウエ", "キムラ"]
+    family_alpha = ["Yamada", "Sato", "Suzuki", "Takahashi", "Tanaka", "Ito", "Watanabe", "Nakamura", "Kobayashi", "Kato", "Yoshida", "Yamamoto", "Matsumoto", "Inoue", "Kimura"]
+
+    existing = db.query(models.ResearcherInformation).count()
+    if existing < args.count:
+        print(f"Generating {args.count - existing} researchers...")
+        batch = []
+        for i in range(existing, args.count):
+            f = rng.randrange(len(family))
+            g = rng.choice(given)
+            suffix = f"{i % 997:03d}"
+            batch.append({
+                "researcher_name": f"{family[f]} {g}{suffix}",
+                "researcher_name_kana": f"{family_kana[f]} {suffix}",
+                "researcher_name_alphabet": f"{family_alpha[f]} {suffix}",
+                "researcher_email": f"researcher{i}@example.com",
+            })
+            if len(batch) == 10000:
+                db.execute(models.ResearcherInformation.__table__.insert(), batch)
+                batch = []
+        if batch:
+            db.execute(models.ResearcherInformation.__table__.insert(), batch)
+        db.commit()
+
+    queries = [f"{rng.choice(family)} {rng.choice(given)}{rng.randrange(997):03d}" for _ in range(args.queries)]
+    queries += [rng.choice(family_alpha).lower() for _ in range(args.queries // 5)]
+
+    started = time.perf_counter()
+    for q in queries:
+        db.query(models.ResearcherInformation).filter(
+            models.ResearcherInformation.researcher_name.ilike(f"%{q}%")
+        ).all()
+    scan_ms = (time.perf_counter() - started) / len(queries) * 1000
+
+    started = time.perf_counter()
+    index = NameIndex.from_db(db)
+    build_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for q in queries:
+        page, _ = index.search(q, limit=20)
+        ids = [researcher_id for _, researcher_id in page]
+        db.query(models.ResearcherInformation.researcher_id).filter(
+            models.ResearcherInformation.researcher_id.in_(ids)
+        ).all()
+    index_ms = (time.perf_counter() - started) / len(queries) * 1000
+
+    print(f"rows={args.count} queries={len(queries)}")
+    print(f"ILIKE scan (all rows)     : {scan_ms:.2f} ms/query")
+    print(f"bigram index build        : {build_s:.2f} s")
+    print(f"bigram index (page of 20) : {index_ms:.2f} ms/query")
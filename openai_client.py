@@ -0,0 +1,345 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import aiohttp
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+load_dotenv()
+
+# Shared HTTP layer for the Azure OpenAI embeddings and chat deployments (sync and async callers).
+# Quotas are per process: with several uvicorn workers, divide the deployment's RPM/TPM between them. 0 = no limit.
+OPENAI_EMBEDDING_RPM = int(os.getenv("OPENAI_EMBEDDING_RPM", "0"))
+OPENAI_EMBEDDING_TPM = int(os.getenv("OPENAI_EMBEDDING_TPM", "0"))
+OPENAI_CHAT_RPM = int(os.getenv("OPENAI_CHAT_RPM", "0"))
+OPENAI_CHAT_TPM = int(os.getenv("OPENAI_CHAT_TPM", "0"))
+OPENAI_HTTP_MAX_CONNECTIONS = int(os.getenv("OPENAI_HTTP_MAX_CONNECTIONS", "100"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "30"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "3"))
+OPENAI_RETRY_BASE_DELAY = float(os.getenv("OPENAI_RETRY_BASE_DELAY", "0.5"))
+OPENAI_RETRY_MAX_DELAY = float(os.getenv("OPENAI_RETRY_MAX_DELAY", "30"))
+# Consecutive failed calls that open the circuit, and how long it stays open before one probe call
+OPENAI_BREAKER_FAILURES = int(os.getenv("OPENAI_BREAKER_FAILURES", "5"))
+OPENAI_BREAKER_RESET = float(os.getenv("OPENAI_BREAKER_RESET", "30"))
+
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+# Statuses that mean the deployment is unusable (not just a bad request) and count against the breaker
+FAILURE_STATUSES = RETRY_STATUSES | {401, 403}
+
+
+class OpenAIError(Exception):
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class CircuitOpenError(OpenAIError):
+    pass
+
+
+# Seconds from retry-after-ms (sent by Azure OpenAI) or Retry-After (seconds or HTTP date); None when absent
+def retry_after_seconds(headers):
+    if headers is None:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return max(0.0, float(headers["retry-after-ms"]) / 1000)
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+# Exponential backoff with full jitter
+def backoff_delay(attempt):
+    return random.uniform(0, min(OPENAI_RETRY_MAX_DELAY, OPENAI_RETRY_BASE_DELAY * 2 ** attempt))
+
+
+class TokenBucket:
+    """Refills per_minute units per minute up to one minute of quota.
+
+    reserve() books the units immediately (the level may go negative) and returns how long the
+    caller has to wait, so concurrent callers queue up behind each other instead of all retrying.
+    """
+
+    def __init__(self, per_minute):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.level -= min(amount, self.capacity)
+            return 0.0 if self.level >= 0 else -self.level / self.rate
+
+    def refund(self, amount):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.level = min(self.capacity, self.level + amount)
+
+
+class RateLimiter:
+    """Client-side RPM + TPM limiter; a 429 pauses every caller until its Retry-After has passed."""
+
+    def __init__(self, rpm=0, tpm=0):
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        self.paused_until = 0.0
+
+    # Seconds to wait before sending a request with an estimated `tokens` tokens
+    def reserve(self, tokens):
+        wait = max(0.0, self.paused_until - time.monotonic())
+        if self.requests is not None:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.reserve(tokens))
+        return wait
+
+    # Correct the token reservation with the usage the API reported (0 when the request was not served)
+    def settle(self, reserved, used):
+        if self.tokens is not None and used < reserved:
+            self.tokens.refund(reserved - used)
+        elif self.tokens is not None and used > reserved:
+            self.tokens.reserve(used - reserved)
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def stats(self):
+        return {
+            "requests_available": round(self.requests.level, 1) if self.requests else None,
+            "tokens_available": round(self.tokens.level, 1) if self.tokens else None,
+            "paused_for": round(max(0.0, self.paused_until - time.monotonic()), 2),
+        }
+
+
+class CircuitBreaker:
+    """closed -> open after failure_threshold consecutive failures -> half_open after reset_timeout
+    (one probe call) -> closed on success, open again on failure.
+
+    A probe that never reports back (e.g. a cancelled task) does not wedge the breaker: after another
+    reset_timeout in half_open the next call is let through as a new probe."""
+
+    STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+    def __init__(self, api, failure_threshold=OPENAI_BREAKER_FAILURES, reset_timeout=OPENAI_BREAKER_RESET):
+        self.api = api
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._lock = threading.Lock()
+        metrics.OPENAI_CIRCUIT_STATE.labels(api=api).set(0)
+
+    def _set_state(self, state):
+        if state != self.state:
+            print(f"OpenAI {self.api} circuit {self.state} -> {state}")
+        self.state = state
+        metrics.OPENAI_CIRCUIT_STATE.labels(api=self.api).set(self.STATES[state])
+
+    # True when a call would be let through (no state change)
+    def available(self):
+        return self.state == "closed" or time.monotonic() - self.opened_at >= self.reset_timeout
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                # opened_at doubles as the probe start while half_open
+                self.opened_at = time.monotonic()
+                self._set_state("half_open")
+                return True
+            self.rejected += 1
+            return False
+
+    def reject(self):
+        with self._lock:
+            self.rejected += 1
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._set_state("closed")
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self._set_state("open")
+
+    def stats(self):
+        return {"state": self.state, "consecutive_failures": self.failures, "rejected": self.rejected}
+
+
+class OpenAIClient:
+    """Pooled keep-alive session, rate limiter, retries and circuit breaker for one Azure OpenAI deployment.
+
+    post() / apost() return the decoded JSON body of a 200 response and raise OpenAIError otherwise
+    (CircuitOpenError without any request while the circuit is open).
+    timeout bounds one attempt; deadline bounds the whole call including rate-limit waits and retries.
+    """
+
+    def __init__(self, api, rpm=0, tpm=0, max_retries=OPENAI_MAX_RETRIES, pool_size=OPENAI_HTTP_MAX_CONNECTIONS):
+        self.api = api
+        self.max_retries = max_retries
+        self.limiter = RateLimiter(rpm, tpm)
+        self.breaker = CircuitBreaker(api)
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+
+    def available(self):
+        return self.breaker.available()
+
+    # Rate-limit wait before the first attempt; raises when the call cannot start in time
+    def _acquire(self, tokens, deadline):
+        if not self.breaker.available():
+            self.breaker.reject()
+            raise CircuitOpenError(f"{self.api} circuit is open")
+        wait = self.limiter.reserve(tokens)
+        if deadline is not None and time.monotonic() + wait >= deadline:
+            self.limiter.settle(tokens, 0)
+            raise OpenAIError(f"{self.api} rate limit wait ({wait:.1f}s) exceeds the deadline", 429)
+        if wait > 0:
+            metrics.OPENAI_RATE_LIMIT_WAIT_SECONDS.labels(api=self.api).observe(wait)
+        return wait
+
+    def _enter(self, tokens):
+        if not self.breaker.allow():
+            self.limiter.settle(tokens, 0)
+            raise CircuitOpenError(f"{self.api} circuit is open")
+
+    def _attempt_timeout(self, timeout, deadline):
+        if deadline is None:
+            return timeout
+        return max(0.1, min(timeout, deadline - time.monotonic()))
+
+    # An exception the retry loop does not handle (bad JSON in a 200, cancellation, ...): count it as a
+    # failed call so a half-open probe always reports back
+    def _aborted(self, tokens):
+        self.limiter.settle(tokens, 0)
+        self.breaker.record_failure()
+
+    def _succeeded(self, tokens, response_data):
+        usage = response_data.get("usage") or {}
+        self.limiter.settle(tokens, usage.get("total_tokens", tokens))
+        self.breaker.record_success()
+        return response_data
+
+    # Delay before the next attempt; raises (and counts a breaker failure) when the call gives up
+    def _retry_delay(self, tokens, attempt, max_retries, deadline, reason, message, headers=None):
+        delay = None
+        if attempt < max_retries:
+            retry_after = retry_after_seconds(headers)
+            if retry_after is not None:
+                delay = retry_after + random.uniform(0, OPENAI_RETRY_BASE_DELAY)
+            else:
+                delay = backoff_delay(attempt)
+            if reason == "429":
+                self.limiter.pause(delay)
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                delay = None
+        if delay is None:
+            self.limiter.settle(tokens, 0)
+            self.breaker.record_failure()
+            raise OpenAIError(message, int(reason) if reason.isdigit() else None)
+        print(f"OpenAI {self.api} {message}, retrying in {delay:.1f}s (attempt {attempt + 1})")
+        metrics.OPENAI_RETRIES.labels(api=self.api, reason=reason).inc()
+        return delay
+
+    def _status_delay(self, tokens, attempt, max_retries, deadline, status, text, headers):
+        message = f"request failed with status code {status}: {text}"
+        if status not in RETRY_STATUSES:
+            self.limiter.settle(tokens, 0)
+            if status in FAILURE_STATUSES:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            raise OpenAIError(message, status)
+        return self._retry_delay(tokens, attempt, max_retries, deadline, str(status), message, headers)
+
+    def post(self, endpoint, headers, data, tokens=1, timeout=OPENAI_TIMEOUT, deadline=None, max_retries=None):
+        deadline = time.monotonic() + deadline if deadline is not None else None
+        max_retries = self.max_retries if max_retries is None else max_retries
+        time.sleep(self._acquire(tokens, deadline))
+        self._enter(tokens)
+
+        try:
+            for attempt in range(max_retries + 1):
+                try:
+                    response = self.session.post(endpoint, headers=headers, data=data,
+                                                 timeout=self._attempt_timeout(timeout, deadline))
+                except requests.RequestException as e:
+                    delay = self._retry_delay(tokens, attempt, max_retries, deadline, "connection",
+                                              f"request error: {e!r}")
+                else:
+                    if response.status_code == 200:
+                        return self._succeeded(tokens, response.json())
+                    delay = self._status_delay(tokens, attempt, max_retries, deadline, response.status_code,
+                                               response.text, response.headers)
+                time.sleep(delay)
+        except OpenAIError:
+            raise
+        except BaseException:
+            self._aborted(tokens)
+            raise
+
+    async def apost(self, session, endpoint, headers, data, tokens=1, timeout=OPENAI_TIMEOUT, deadline=None,
+                    max_retries=None):
+        deadline = time.monotonic() + deadline if deadline is not None else None
+        max_retries = self.max_retries if max_retries is None else max_retries
+        await asyncio.sleep(self._acquire(tokens, deadline))
+        self._enter(tokens)
+
+        try:
+            for attempt in range(max_retries + 1):
+                try:
+                    async with session.post(
+                        endpoint, headers=headers, data=data,
+                        timeout=aiohttp.ClientTimeout(total=self._attempt_timeout(timeout, deadline))
+                    ) as response:
+                        if response.status == 200:
+                            return self._succeeded(tokens, await response.json(content_type=None))
+                        status, text, response_headers = response.status, await response.text(), response.headers
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    delay = self._retry_delay(tokens, attempt, max_retries, deadline, "connection",
+                                              f"request error: {e!r}")
+                else:
+                    delay = self._status_delay(tokens, attempt, max_retries, deadline, status, text,
+                                               response_headers)
+                await asyncio.sleep(delay)
+        except OpenAIError:
+            raise
+        except BaseException:
+            self._aborted(tokens)
+            raise
+
+    def stats(self):
+        return {"circuit": self.breaker.stats(), "rate_limit": self.limiter.stats()}
+
+
+embedding_client = OpenAIClient("embeddings", OPENAI_EMBEDDING_RPM, OPENAI_EMBEDDING_TPM)
+chat_client = OpenAIClient("chat", OPENAI_CHAT_RPM, OPENAI_CHAT_TPM)
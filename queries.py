@@ -0,0 +1,384 @@
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+from sqlalchemy import and_, func, or_, select, update
+
+import models
+
+# Statements, request bodies and response shapes shared by the sync (main.py) and async (main_async.py) apps.
+# Every builder returns a 2.0-style select() so it runs on both Session and AsyncSession.
+
+
+# NDJSON 全件エクスポートで1回のクエリに取得する件数
+EXPORT_PAGE_SIZE = 1000
+
+
+# Researcher一覧（一覧に必要なカラムのみ）
+def researcher_list_select(research_field=None, keywords=None, after_id=None):
+    stmt = select(
+        models.ResearcherInformation.researcher_id,
+        models.ResearcherInformation.researcher_name,
+        models.ResearcherInformation.researcher_position_current,
+        models.ResearcherInformation.research_field_pi,
+        models.ResearcherInformation.keywords_pi,
+    )
+    if research_field:
+        stmt = stmt.where(models.ResearcherInformation.research_field_pi.contains(research_field, autoescape=True))
+    for keyword in keywords or []:
+        stmt = stmt.where(models.ResearcherInformation.keywords_pi.contains(keyword, autoescape=True))
+    if after_id is not None:
+        stmt = stmt.where(models.ResearcherInformation.researcher_id > after_id)
+    return stmt.order_by(models.ResearcherInformation.researcher_id)
+
+
+def researcher_item(r):
+    return {
+        "researcher_id": r.researcher_id,
+        "researcher_name": r.researcher_name,
+        "position": r.researcher_position_current,
+        "research_field": r.research_field_pi,
+        "keywords": r.keywords_pi,
+    }
+
+
+# 氏名検索結果の1ページ分（ID指定）
+def researcher_summary_select(ids):
+    return select(
+        models.ResearcherInformation.researcher_id,
+        models.ResearcherInformation.researcher_name,
+        models.ResearcherInformation.researcher_affiliation_current,
+        models.ResearcherInformation.researcher_department_current,
+    ).where(models.ResearcherInformation.researcher_id.in_(ids))
+
+
+def researcher_summary_item(r):
+    return {
+        "researcher_id": r.researcher_id,
+        "researcher_name": r.researcher_name,
+        "researcher_affiliation_current": r.researcher_affiliation_current,
+        "researcher_department_current": r.researcher_department_current,
+    }
+
+
+# マッチング一覧/詳細で使うカラムのみを project → company_user → company の外部結合で1クエリ取得
+def matching_project_select():
+    return (
+        select(
+            models.MatchingInformation.matching_id,
+            models.MatchingInformation.project_id,
+            models.MatchingInformation.researcher_id,
+            models.MatchingInformation.matching_status,
+            models.MatchingInformation.matched_date,
+            models.ProjectInformation.project_title,
+            models.ProjectInformation.consultation_category,
+            models.ProjectInformation.project_content,
+            models.ProjectInformation.research_field,
+            models.ProjectInformation.application_deadline,
+            models.ProjectInformation.budget,
+            models.CompanyUser.company_user_name,
+            models.CompanyUser.department,
+            models.Company.company_name,
+        )
+        .outerjoin(
+            models.ProjectInformation,
+            models.MatchingInformation.project_id == models.ProjectInformation.project_id,
+        )
+        .outerjoin(
+            models.CompanyUser,
+            models.ProjectInformation.company_user_id == models.CompanyUser.company_user_id,
+        )
+        .outerjoin(
+            models.Company,
+            models.CompanyUser.company_id == models.Company.company_id,
+        )
+    )
+
+
+def matching_list_select(researcher_id, matching_status):
+    return matching_project_select().where(
+        models.MatchingInformation.researcher_id == researcher_id,
+        models.MatchingInformation.matching_status == matching_status
+    )
+
+
+def matching_detail_select(matching_id):
+    return matching_project_select().where(
+        models.MatchingInformation.matching_id == matching_id
+    )
+
+
+def matching_item(m):
+    return {
+        "matching_id": m.matching_id,
+        "project_id": m.project_id,
+        "researcher_id": m.researcher_id,
+        #"matching_reason":m.matching_reason,
+        "project_title": m.project_title,
+        "consultation_category": m.consultation_category,
+        "project_content": m.project_content,
+        "research_field": m.research_field,
+        #"project_status": m.project_status,
+        "application_deadline": m.application_deadline,
+        "budget": m.budget,
+        #"preferred_researcher_level": m.preferred_researcher_level,
+        "company_user_name": m.company_user_name,
+        "department": m.department,
+        "company_name": m.company_name,
+    }
+
+
+def matching_detail_item(matching):
+    return {
+        "matching_id": matching.matching_id,
+        "project_id": matching.project_id,
+        "researcher_id": matching.researcher_id,
+        "matching_status": matching.matching_status,
+        "matched_date": matching.matched_date,
+        #"matching_reason": matching.matching_reason,
+        "project_title": matching.project_title,
+        "consultation_category": matching.consultation_category,
+        "project_content": matching.project_content,
+        "research_field": matching.research_field,
+        #"project_status": matching.project_status,
+        "application_deadline": matching.application_deadline,
+        "budget": matching.budget,
+        #"preferred_researcher_level": matching.preferred_researcher_level,
+        "company_user_name": matching.company_user_name,
+        "department": matching.department,
+        "company_name": matching.company_name
+    }
+
+
+# 一括ステータス更新：対象行を行ロック付きで取得し、1回の UPDATE ... IN で更新
+def matching_status_select(matching_ids):
+    return select(
+        models.MatchingInformation.matching_id,
+        models.MatchingInformation.researcher_id,
+        models.MatchingInformation.matching_status,
+    ).where(models.MatchingInformation.matching_id.in_(matching_ids)).with_for_update()
+
+
+def matching_status_update(matching_ids, new_status):
+    return (
+        update(models.MatchingInformation)
+        .where(models.MatchingInformation.matching_id.in_(matching_ids))
+        .values(matching_status=new_status)
+    )
+
+
+# IDごとの結果（updated / unchanged / not_found）と、実際に更新する行
+def matching_status_outcomes(matching_ids, rows, new_status):
+    by_id = {row.matching_id: row for row in rows}
+    results = []
+    changed = []
+    for matching_id in dict.fromkeys(matching_ids):
+        row = by_id.get(matching_id)
+        if row is None:
+            outcome = "not_found"
+        elif row.matching_status == new_status:
+            outcome = "unchanged"
+        else:
+            outcome = "updated"
+            changed.append(row)
+        results.append({"matching_id": matching_id, "outcome": outcome})
+    return results, changed
+
+
+class MatchingStatusBulkRequest(BaseModel):
+    matching_ids: List[int] = Field(..., min_length=1, max_length=1000)
+    new_status: int
+
+
+# 一括作成の結果：検索順に研究者IDごとの結果（created / existing）
+def matching_create_response(project_id, results, created):
+    created = set(created)
+    outcomes = []
+    for researcher_id in dict.fromkeys(r["researcher_id"] for r in results):
+        try:
+            researcher_id = int(researcher_id)
+        except (TypeError, ValueError):
+            continue
+        outcomes.append({
+            "researcher_id": researcher_id,
+            "outcome": "created" if researcher_id in created else "existing",
+        })
+    return {"status": "success", "project_id": project_id, "created": len(created), "results": outcomes}
+
+
+# メッセージの状態（message_status）
+MESSAGE_UNREAD = 0
+MESSAGE_READ = 1
+
+
+# メッセージのキーセットカーソル "<post_datetime>:<message_id>"（MESSAGE_START_CURSOR はスレッドの先頭）
+def encode_message_cursor(post_datetime, message_id):
+    return f"{post_datetime.isoformat()}:{message_id}"
+
+
+def decode_message_cursor(cursor):
+    posted, message_id = cursor.rsplit(":", 1)
+    return datetime.fromisoformat(posted), int(message_id)
+
+
+MESSAGE_START_CURSOR = encode_message_cursor(datetime.min, 0)
+
+
+def _message_select(matching_id):
+    return select(
+        models.MessageInformation.message_id,
+        models.MessageInformation.matching_id,
+        models.MessageInformation.message_content,
+        models.MessageInformation.sender_classification,
+        models.MessageInformation.post_datetime,
+        models.MessageInformation.message_status,
+    ).where(
+        models.MessageInformation.matching_id == matching_id,
+        models.MessageInformation.post_datetime.isnot(None),
+    )
+
+
+# (post_datetime, message_id) がカーソルより後 / より前 / カーソル以前
+def _message_after(cursor):
+    posted, message_id = decode_message_cursor(cursor)
+    return or_(
+        models.MessageInformation.post_datetime > posted,
+        and_(models.MessageInformation.post_datetime == posted, models.MessageInformation.message_id > message_id),
+    )
+
+
+def _message_before(cursor):
+    posted, message_id = decode_message_cursor(cursor)
+    return or_(
+        models.MessageInformation.post_datetime < posted,
+        and_(models.MessageInformation.post_datetime == posted, models.MessageInformation.message_id < message_id),
+    )
+
+
+def _message_not_after(cursor):
+    posted, message_id = decode_message_cursor(cursor)
+    return or_(
+        models.MessageInformation.post_datetime < posted,
+        and_(models.MessageInformation.post_datetime == posted, models.MessageInformation.message_id <= message_id),
+    )
+
+
+# メッセージ履歴：新しい順（before 指定時はそれより古いもの）。(matching_id, post_datetime, message_id) の索引で解決
+def message_history_select(matching_id, before=None):
+    stmt = _message_select(matching_id)
+    if before:
+        stmt = stmt.where(_message_before(before))
+    return stmt.order_by(models.MessageInformation.post_datetime.desc(), models.MessageInformation.message_id.desc())
+
+
+# 差分取得：since より新しいメッセージを古い順に
+def message_since_select(matching_id, since):
+    return _message_select(matching_id).where(_message_after(since)).order_by(
+        models.MessageInformation.post_datetime, models.MessageInformation.message_id
+    )
+
+
+def message_item(m):
+    return {
+        "message_id": m.message_id,
+        "matching_id": m.matching_id,
+        "message_content": m.message_content,
+        "sender_classification": m.sender_classification,
+        "post_datetime": m.post_datetime,
+        "message_status": m.message_status,
+        "cursor": encode_message_cursor(m.post_datetime, m.message_id),
+    }
+
+
+# limit + 1 件取得した結果から1ページを組み立てる（messages は常に古い順）。
+# 履歴: next_cursor は次に古いページの before。差分: next_cursor は続きがあるときの since。
+# latest_cursor は次回の差分取得・ロングポーリング・SSE に渡すカーソル
+def message_page(rows, limit, since=None):
+    items = [message_item(m) for m in rows[:limit]]
+    more = len(rows) > limit
+    if since is None:
+        items.reverse()
+        next_cursor = items[0]["cursor"] if more else None
+    else:
+        next_cursor = items[-1]["cursor"] if more else None
+    latest_cursor = items[-1]["cursor"] if items else since or MESSAGE_START_CURSOR
+    return {"status": "success", "messages": items, "next_cursor": next_cursor, "latest_cursor": latest_cursor}
+
+
+# 未読件数をマッチングごとに1回の集計クエリで取得（未読があるマッチングのみ返る）
+def message_unread_count_select(researcher_id=None, matching_ids=None, sender_classification=None):
+    stmt = select(
+        models.MessageInformation.matching_id,
+        func.count(models.MessageInformation.message_id).label("unread"),
+    ).where(models.MessageInformation.message_status == MESSAGE_UNREAD)
+    if researcher_id is not None:
+        stmt = stmt.join(
+            models.MatchingInformation,
+            models.MatchingInformation.matching_id == models.MessageInformation.matching_id,
+        ).where(models.MatchingInformation.researcher_id == researcher_id)
+    if matching_ids:
+        stmt = stmt.where(models.MessageInformation.matching_id.in_(matching_ids))
+    if sender_classification is not None:
+        stmt = stmt.where(models.MessageInformation.sender_classification == sender_classification)
+    return stmt.group_by(models.MessageInformation.matching_id).order_by(models.MessageInformation.matching_id)
+
+
+def message_unread_counts(rows):
+    counts = [{"matching_id": row.matching_id, "unread": row.unread} for row in rows]
+    return {"status": "success", "counts": counts, "total": sum(count["unread"] for count in counts)}
+
+
+# 既読化：up_to（含む）までの未読メッセージを1回の UPDATE で既読にする
+def message_read_update(matching_id, sender_classification=None, up_to=None):
+    stmt = update(models.MessageInformation).where(
+        models.MessageInformation.matching_id == matching_id,
+        models.MessageInformation.message_status == MESSAGE_UNREAD,
+    )
+    if sender_classification is not None:
+        stmt = stmt.where(models.MessageInformation.sender_classification == sender_classification)
+    if up_to:
+        stmt = stmt.where(_message_not_after(up_to))
+    return stmt.values(message_status=MESSAGE_READ).execution_options(synchronize_session=False)
+
+
+def new_message(matching_id, request):
+    return models.MessageInformation(
+        matching_id=matching_id,
+        message_content=request.message_content,
+        sender_classification=request.sender_classification,
+        # MySQL の DATETIME は秒単位：返すカーソルと保存される値を一致させる
+        post_datetime=datetime.now().replace(microsecond=0),
+        message_status=MESSAGE_UNREAD,
+    )
+
+
+class MessageCreateRequest(BaseModel):
+    message_content: str = Field(..., min_length=1, max_length=5000)
+    sender_classification: int
+
+
+# ベクトル検索のリクエストボディ
+class SearchRequest(BaseModel):
+    category: str = ""
+    field: str = ""
+    description: str = ""
+    top_k: int = Field(10, ge=1, le=50)
+    explain: bool = True
+    # "vector" / "hybrid"（未指定なら SEARCH_MODE）と、研究分野での絞り込み（部分一致）
+    mode: Optional[str] = Field(None, pattern="^(vector|hybrid)$")
+    research_field: Optional[str] = None
+    # 研究者単位に集約（max / sum / top_n_mean）し、重複のない上位 top_k 名を返す
+    aggregation: Optional[str] = Field(None, pattern="^(max|sum|top_n_mean)$")
+    aggregation_top_n: int = Field(3, ge=1, le=10)
+
+    def filters(self):
+        return {"research_field_pi": self.research_field} if self.research_field else None
+
+    # search_researchers と同じ依頼文（推薦理由のキャッシュキーにも使われる）
+    def query_text(self):
+        return f"{self.category} {self.field} {self.description}"
+
+
+# 案件の条件で検索し、結果からマッチングを一括作成するリクエストボディ
+class MatchingCreateRequest(SearchRequest):
+    project_id: int
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+load_dotenv()
+
+# Cache settings; RESPONSE_CACHE_URL (redis://...) switches to a backend shared by all workers
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "300"))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "10000"))
+RESPONSE_CACHE_URL = os.getenv("RESPONSE_CACHE_URL", "")
+
+
+class MemoryCacheBackend:
+    """Per-process LRU with TTL. Invalidation only reaches the worker that made the write."""
+
+    def __init__(self, max_size=RESPONSE_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl if ttl else None, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def incr(self, key):
+        with self._lock:
+            _, value = self._entries.get(key, (None, 0))
+            self._entries[key] = (None, value + 1)
+            self._entries.move_to_end(key)
+            return value + 1
+
+
+class RedisCacheBackend:
+    """Shared backend for multiple uvicorn workers/instances (needs the optional redis package)."""
+
+    def __init__(self, url):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        value = self.client.get(key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl=None):
+        self.client.set(key, json.dumps(value), ex=ttl)
+
+    def incr(self, key):
+        return self.client.incr(key)
+
+
+class ResponseCache:
+    """JSON response cache keyed by endpoint + parameters.
+
+    Every entry is tagged (e.g. "researcher:12", "matching:34"). The cache key embeds the
+    current version of each tag, so invalidate() only bumps tag versions and stale entries
+    are never read again; they simply age out of the backend. A payload built concurrently
+    with an invalidation is stored under the old version and is never served.
+    """
+
+    def __init__(self, backend, ttl=RESPONSE_CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def _key(self, endpoint, params, tags):
+        versions = [f"{tag}@{self.tag_version(tag)}" for tag in sorted(tags)]
+        raw = json.dumps([endpoint, sorted(params.items()), versions], default=str)
+        return "response:" + hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def tag_version(self, tag):
+        return self.backend.get(f"tag:{tag}") or 0
+
+    def invalidate(self, tags):
+        for tag in tags:
+            self.backend.incr(f"tag:{tag}")
+
+    def lookup(self, endpoint, params, tags):
+        key = self._key(endpoint, params, tags)
+        entry = self.backend.get(key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return key, entry
+
+    def store(self, key, payload):
+        body = json.dumps(jsonable_encoder(payload), ensure_ascii=False, separators=(",", ":"))
+        entry = {"body": body, "etag": '"' + hashlib.sha256(body.encode("utf-8")).hexdigest()[:32] + '"'}
+        self.backend.set(key, entry, self.ttl)
+        return entry
+
+    def respond(self, request: Request, entry):
+        headers = {"ETag": entry["etag"], "Cache-Control": "no-cache"}
+        if_none_match = [tag.strip().removeprefix("W/") for tag in request.headers.get("if-none-match", "").split(",")]
+        if entry["etag"] in if_none_match or "*" in if_none_match:
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry["body"], media_type="application/json", headers=headers)
+
+    # Serve from cache (or 304) or build the payload with build() and cache it
+    def get_or_build(self, request: Request, endpoint, params, tags, build):
+        key, entry = self.lookup(endpoint, params, tags)
+        if entry is None:
+            entry = self.store(key, build())
+        return self.respond(request, entry)
+
+    async def aget_or_build(self, request: Request, endpoint, params, tags, build):
+        key, entry = self.lookup(endpoint, params, tags)
+        if entry is None:
+            entry = self.store(key, await build())
+        return self.respond(request, entry)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "not_modified": self.not_modified}
+
+
+def create_response_cache():
+    if RESPONSE_CACHE_URL:
+        try:
+            return ResponseCache(RedisCacheBackend(RESPONSE_CACHE_URL))
+        except Exception as e:
+            print(f"Error initializing shared response cache, using in-process cache: {str(e)}")
+    return ResponseCache(MemoryCacheBackend())
+
+
+response_cache = create_response_cache()
+
+
+# Tags used by the matching endpoints
+def researcher_tag(researcher_id):
+    return f"researcher:{researcher_id}"
+
+
+def matching_tag(matching_id):
+    return f"matching:{matching_id}"
+
+
+# Bumped on every new message; long-poll / SSE waiters watch it instead of querying the database
+def messages_tag(matching_id):
+    return f"messages:{matching_id}"
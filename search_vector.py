@@ -1,11 +1,19 @@
 import os
 import pandas as pd
 from azure.search.documents import SearchClient
-from azure.search.documents.models import VectorizedQuery
+from azure.search.documents.aio import SearchClient as AsyncSearchClient
+from azure.search.documents.indexes import SearchIndexClient
 from azure.core.credentials import AzureKeyCredential
-import requests
 import json
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
+import metrics
+from embedding_cache import embedding_cache
+from explanation_cache import explanation_cache, make_key as explanation_key
+from openai_client import OPENAI_TIMEOUT, CircuitOpenError, OpenAIError, chat_client, embedding_client
+from vector_index import AzureSearchBackend, LocalVectorIndex, SELECT_FIELDS
 
 load_dotenv()
 
@@ -20,6 +28,34 @@ AZURE_SEARCH_API_KEY = os.getenv("AZURE_SEARCH_API_KEY", "")
 AZURE_SEARCH_ENDPOINT = os.getenv("AZURE_SEARCH_ENDPOINT", "")
 AZURE_SEARCH_INDEX_NAME = os.getenv("AZURE_SEARCH_INDEX_NAME", "")
 AZURE_OPENAI_GPT_DEPLOYMENT_NAME = os.getenv("AZURE_OPENAI_GPT_DEPLOYMENT_NAME", "")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-large")
+# "azure" (Azure AI Search) or "local" (LocalVectorIndex files at LOCAL_INDEX_PATH)
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "azure")
+LOCAL_INDEX_PATH = os.getenv("LOCAL_INDEX_PATH", "researcher_index")
+# Local index coarse pass: "float32" (off), "float16" or "int8"; vectors truncated to LOCAL_INDEX_DIMS (0 = full)
+# and the best top_k * LOCAL_INDEX_RESCORE rows rescored against the full-precision vectors
+LOCAL_INDEX_PRECISION = os.getenv("LOCAL_INDEX_PRECISION", "float32")
+LOCAL_INDEX_DIMS = int(os.getenv("LOCAL_INDEX_DIMS", "0"))
+LOCAL_INDEX_RESCORE = int(os.getenv("LOCAL_INDEX_RESCORE", "4"))
+# Default search mode: "vector" (embedding only) or "hybrid" (keyword + vector, fused by RRF)
+SEARCH_MODE = os.getenv("SEARCH_MODE", "vector")
+# Researcher-level grouping: project documents fetched per requested researcher (capped) and
+# how many best projects feed the "top_n_mean" score and the explanation prompt
+SEARCH_OVERFETCH = int(os.getenv("SEARCH_OVERFETCH", "5"))
+SEARCH_MAX_CANDIDATES = int(os.getenv("SEARCH_MAX_CANDIDATES", "300"))
+SEARCH_AGGREGATION_TOP_N = int(os.getenv("SEARCH_AGGREGATION_TOP_N", "3"))
+
+# Explanation generation settings (max parallel chat completions / per-call budget in seconds, retries included)
+EXPLANATION_MAX_WORKERS = int(os.getenv("EXPLANATION_MAX_WORKERS", "5"))
+EXPLANATION_TIMEOUT = float(os.getenv("EXPLANATION_TIMEOUT", "30"))
+CHAT_MAX_TOKENS = 300
+
+# Bulk embedding settings (inputs per request / estimated tokens per request / parallel requests / retries)
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))
+EMBEDDING_BATCH_TOKENS = int(os.getenv("EMBEDDING_BATCH_TOKENS", "100000"))
+EMBEDDING_MAX_WORKERS = int(os.getenv("EMBEDDING_MAX_WORKERS", "4"))
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "5"))
+EMBEDDING_MAX_INPUT_TOKENS = 8191
 
 print(f"AZURE_SEARCH_INDEX_NAME: {AZURE_SEARCH_INDEX_NAME}")
 
@@ -35,96 +71,244 @@ except Exception as e:
     print(f"Error initializing Azure Search client: {str(e)}")
     search_client = None
 
-# Helper function: Examine index structure
-def explore_index_structure():
+# Azure AI Search index client (schema lookups only)
+try:
+    search_index_client = SearchIndexClient(
+        endpoint=AZURE_SEARCH_ENDPOINT,
+        credential=AzureKeyCredential(AZURE_SEARCH_API_KEY)
+    )
+except Exception as e:
+    print(f"Error initializing Azure Search index client: {str(e)}")
+    search_index_client = None
+
+# Async Azure AI Search client (used by the async app)
+try:
+    async_search_client = AsyncSearchClient(
+        endpoint=AZURE_SEARCH_ENDPOINT,
+        index_name=AZURE_SEARCH_INDEX_NAME,
+        credential=AzureKeyCredential(AZURE_SEARCH_API_KEY)
+    )
+except Exception as e:
+    print(f"Error initializing async Azure Search client: {str(e)}")
+    async_search_client = None
+
+# Vector search backend setting
+def create_search_backend(name=None):
+    name = name or SEARCH_BACKEND
+    if name == "local":
+        try:
+            index = LocalVectorIndex.load(LOCAL_INDEX_PATH)
+            index.use_compact(LOCAL_INDEX_PRECISION, LOCAL_INDEX_DIMS or None, LOCAL_INDEX_RESCORE, LOCAL_INDEX_PATH)
+            print(f"Local vector index loaded: {len(index)} documents ({LOCAL_INDEX_PRECISION})")
+            if SEARCH_MODE == "hybrid":
+                index.keyword_index()
+            return index
+        except Exception as e:
+            print(f"Error loading local vector index: {str(e)}")
+            return None
+    if not search_client:
+        return None
+    return AzureSearchBackend(search_client, search_index_client, AZURE_SEARCH_INDEX_NAME, async_search_client)
+
+search_backend = create_search_backend()
+
+# Index schema cached in memory; loaded once at startup (or on first search) and on explicit refresh
+index_schema = {"fields": [], "loaded_at": None, "error": None}
+
+def refresh_index_schema():
+    if search_backend is None:
+        index_schema.update(fields=[], loaded_at=None, error="Search backend not initialized")
+        return index_schema
     try:
-        if not search_client:
-            print("Search client not initialized")
-            return False
-            
-        # Get first document to check field structure
-        results = search_client.search(search_text="*", top=1)
-        sample_doc = next(results, None)
-        
-        if sample_doc:
-            print("\nIndex structure:")
-            for field_name in sample_doc.keys():
-                if not field_name.startswith('@'):
-                    field_value = sample_doc[field_name]
-                    value_preview = str(field_value)[:50] + "..." if len(str(field_value)) > 50 else str(field_value)
-                    print(f"- {field_name}: {value_preview}")
-            return True
-        else:
-            print("No documents found in index.")
-            return False
+        fields = search_backend.load_schema()
+        if fields is None:
+            index_schema.update(fields=[], loaded_at=None, error="Index schema unavailable (no index client)")
+            print("Index schema unavailable (no index client); using the default select fields")
+            return index_schema
+        index_schema.update(fields=fields, loaded_at=time.time(), error=None)
+        names = {field["name"] for field in fields}
+        missing = [field for field in SELECT_FIELDS if field not in names]
+        print(f"Index schema loaded: {len(fields)} fields")
+        if missing:
+            print(f"Warning: index is missing select fields {missing}. Run register_index.py to recreate the index.")
     except Exception as e:
-        print(f"Error checking index structure: {str(e)}")
-        return False
+        print(f"Error loading index schema: {str(e)}")
+        index_schema["error"] = str(e)
+    return index_schema
+
+# Select list restricted to retrievable fields that exist in the cached schema
+def get_select_fields():
+    if index_schema["loaded_at"] is None and index_schema["error"] is None:
+        refresh_index_schema()
+    if index_schema["loaded_at"] is None:
+        return list(SELECT_FIELDS)
+    retrievable = {field["name"] for field in index_schema["fields"] if field.get("retrievable", True)}
+    return [field for field in SELECT_FIELDS if field in retrievable]
 
-# Get embedding using direct REST API call
+# Embeddings REST request (endpoint, headers, JSON body), shared by the sync and async clients
+def embedding_request(texts):
+    api_version = "2023-07-01-preview"
+    endpoint = f"{AZURE_OPENAI_ENDPOINT}/openai/deployments/{EMBEDDING_MODEL}/embeddings?api-version={api_version}"
+    headers = {
+        "Content-Type": "application/json",
+        "api-key": AZURE_OPENAI_API_KEY
+    }
+    data = {
+        "input": texts,
+        "model": EMBEDDING_MODEL
+    }
+    return endpoint, headers, json.dumps(data)
+
+# Get embedding using direct REST API call (served from embedding_cache when possible)
 def get_embedding(text):
+    cached = embedding_cache.get(EMBEDDING_MODEL, text)
+    if cached is not None:
+        return cached
+
+    started = time.perf_counter()
+    outcome = "error"
     try:
-        api_version = "2023-07-01-preview"
-        endpoint = f"{AZURE_OPENAI_ENDPOINT}/openai/deployments/text-embedding-3-large/embeddings?api-version={api_version}"
-        
-        headers = {
-            "Content-Type": "application/json",
-            "api-key": AZURE_OPENAI_API_KEY
-        }
-        
-        data = {
-            "input": text,
-            "model": "text-embedding-3-large"
-        }
-        
-        response = requests.post(endpoint, headers=headers, data=json.dumps(data))
-        
-        if response.status_code == 200:
-            response_data = response.json()
-            return response_data['data'][0]['embedding']
-        else:
-            print(f"Embedding API error: {response.status_code} - {response.text}")
-            return []
+        endpoint, headers, data = embedding_request(text)
+        response_data = embedding_client.post(endpoint, headers, data, tokens=estimate_tokens(text),
+                                              deadline=OPENAI_TIMEOUT)
+        metrics.record_usage("embeddings", response_data.get("usage"))
+        embedding = response_data['data'][0]['embedding']
+        embedding_cache.put(EMBEDDING_MODEL, text, embedding)
+        outcome = "ok"
+        return embedding
     except Exception as e:
         print(f"Error generating embedding: {str(e)}")
         return []
+    finally:
+        metrics.observe_since(metrics.EMBEDDING_SECONDS, started, outcome=outcome)
+
+# Rough token estimate without a tokenizer (Japanese text is close to one token per character)
+def estimate_tokens(text):
+    return max(1, len(text))
+
+# Cut an input to the model's limit (by the same one-token-per-character estimate) before it is sent
+def truncate_input(text):
+    return text[:EMBEDDING_MAX_INPUT_TOKENS]
+
+# Split texts into request-sized batches by input count and estimated tokens
+def chunk_texts(texts, batch_size=None, max_tokens=None):
+    batch_size = batch_size or EMBEDDING_BATCH_SIZE
+    max_tokens = max_tokens or EMBEDDING_BATCH_TOKENS
+    batches = []
+    start = 0
+    tokens = 0
+    for index, text in enumerate(texts):
+        text_tokens = min(estimate_tokens(text), EMBEDDING_MAX_INPUT_TOKENS)
+        if index > start and (index - start >= batch_size or tokens + text_tokens > max_tokens):
+            batches.append((start, index))
+            start = index
+            tokens = 0
+        tokens += text_tokens
+    if start < len(texts):
+        batches.append((start, len(texts)))
+    return batches
+
+# Post one batch of inputs through embedding_client (rate limited, retries 429/5xx honouring Retry-After)
+def _post_embeddings(texts, max_retries=None):
+    endpoint, headers, data = embedding_request(texts)
+    max_retries = EMBEDDING_MAX_RETRIES if max_retries is None else max_retries
+    tokens = sum(min(estimate_tokens(text), EMBEDDING_MAX_INPUT_TOKENS) for text in texts)
+    response_data = embedding_client.post(endpoint, headers, data, tokens=tokens, timeout=60, max_retries=max_retries)
+    metrics.record_usage("embeddings", response_data.get("usage"))
+    items = sorted(response_data['data'], key=lambda item: item['index'])
+    return [item['embedding'] for item in items]
 
-# ChatGPT response using direct REST API call
-def get_openai_response(messages):
+# Some text takes more than one token per character, so a truncated input can still be over the limit (400).
+# The batch is then re-sent one input at a time, halving any long input the API keeps rejecting.
+def _embed_batch(texts, max_retries=None):
     try:
-        api_version = "2024-08-01-preview"
-        endpoint = f"{AZURE_OPENAI_GPT_ENDPOINT}/openai/deployments/{AZURE_OPENAI_GPT_DEPLOYMENT_NAME}/chat/completions?api-version={api_version}"
+        return _post_embeddings(texts, max_retries)
+    except OpenAIError as e:
+        if e.status != 400:
+            raise
+    vectors = []
+    for text in texts:
+        while True:
+            try:
+                vectors.extend(_post_embeddings([text], max_retries))
+                break
+            except OpenAIError as e:
+                if e.status != 400 or len(text) <= EMBEDDING_MAX_INPUT_TOKENS // 8:
+                    raise
+                text = text[:len(text) // 2]
+                print(f"Embedding input rejected, retrying with the first {len(text)} characters")
+    return vectors
 
-        headers = {
-            "Content-Type": "application/json",
-            "api-key": AZURE_OPENAI_GPT_API_KEY
-        }
+# Embed many texts at once; returns a (len(texts), dim) float32 matrix in input order.
+# Raises if any batch still fails after retries so bulk jobs never store partial results.
+def get_embeddings(texts, batch_size=None, max_tokens=None, max_workers=None):
+    texts = [truncate_input(text) for text in texts]
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
 
-        data = {
-            "messages": messages,
-            "temperature": 0.0,
-            "max_tokens": 300
-        }
+    batches = chunk_texts(texts, batch_size, max_tokens)
+    print(f"Embedding {len(texts)} texts in {len(batches)} batches")
+    matrix = None
+    with ThreadPoolExecutor(max_workers=max_workers or EMBEDDING_MAX_WORKERS) as executor:
+        futures = {executor.submit(_embed_batch, texts[start:end]): (start, end) for start, end in batches}
+        for future in as_completed(futures):
+            start, end = futures[future]
+            vectors = np.asarray(future.result(), dtype=np.float32)
+            if matrix is None:
+                matrix = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+            matrix[start:end] = vectors
+    return matrix
 
-        response = requests.post(endpoint, headers=headers, data=json.dumps(data))
+# Chat completions REST request (endpoint, headers, JSON body), shared by the sync and async clients
+def chat_request(messages):
+    api_version = "2024-08-01-preview"
+    endpoint = f"{AZURE_OPENAI_GPT_ENDPOINT}/openai/deployments/{AZURE_OPENAI_GPT_DEPLOYMENT_NAME}/chat/completions?api-version={api_version}"
+    headers = {
+        "Content-Type": "application/json",
+        "api-key": AZURE_OPENAI_GPT_API_KEY
+    }
+    data = {
+        "messages": messages,
+        "temperature": 0.0,
+        "max_tokens": CHAT_MAX_TOKENS
+    }
+    return endpoint, headers, json.dumps(data)
 
-        if response.status_code == 200:
-            response_data = response.json()
-            return response_data['choices'][0]['message']['content']
-        else:
-            error_msg = f"Request failed with status code {response.status_code}: {response.text}"
-            print(error_msg)
-            return f"Error occurred: {error_msg}"
+# Token estimate reserved against the chat TPM quota (Azure counts max_tokens towards it)
+def chat_tokens(messages):
+    return sum(estimate_tokens(message["content"]) for message in messages) + CHAT_MAX_TOKENS
+
+# ChatGPT response using direct REST API call.
+# Returns None when the call fails or the chat circuit is open, so callers degrade to no explanation.
+def get_openai_response(messages, timeout=None):
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        endpoint, headers, data = chat_request(messages)
+        timeout = timeout or EXPLANATION_TIMEOUT
+        response_data = chat_client.post(endpoint, headers, data, tokens=chat_tokens(messages),
+                                         timeout=timeout, deadline=timeout)
+        metrics.record_usage("chat", response_data.get("usage"))
+        outcome = "ok"
+        return response_data['choices'][0]['message']['content']
+    except CircuitOpenError:
+        outcome = "circuit_open"
+        return None
     except Exception as e:
         print(f"API call error: {str(e)}")
-        return f"Error occurred: {str(e)}"
+        return None
+    finally:
+        metrics.observe_since(metrics.CHAT_SECONDS, started, outcome=outcome)
 
-# Generate explanation for researcher match
-def generate_explanation(query_text, researcher):
+# Explanation prompt for a researcher match: (cache key, chat messages)
+def explanation_request(query_text, researcher):
     # Use fields that exist in the index
     research_field = researcher.get("research_field_pi", researcher.get("research_field_jp", ""))
     keywords = researcher.get("keywords_pi", researcher.get("keywords_jp", ""))
     title = researcher.get("research_project_title", "")
+    # Grouped researchers: the best-matching projects as context
+    if researcher.get("projects"):
+        title = " / ".join(project["research_project_title"] or "" for project in researcher["projects"])
     
     prompt = f"""
     依頼内容: {query_text}
@@ -134,16 +318,111 @@ def generate_explanation(query_text, researcher):
     
     なぜこの研究者が依頼内容に適しているのかを簡潔に説明してください。
     """
+    cache_key = explanation_key(AZURE_OPENAI_GPT_DEPLOYMENT_NAME, query_text, title, research_field, keywords)
     messages = [{"role": "system", "content": "あなたは検索結果の解説を行うアシスタントです。"},
                 {"role": "user", "content": prompt}]
+    return cache_key, messages
 
-    return get_openai_response(messages)
+# Generate explanation for researcher match (None when the chat deployment is unavailable;
+# cached explanations are still served while the circuit is open)
+def generate_explanation(query_text, researcher, timeout=None):
+    cache_key, messages = explanation_request(query_text, researcher)
+    cached = explanation_cache.get(cache_key)
+    if cached is not None:
+        return cached
 
-# Vector search
-def search_researchers(category, field, description, top_k=10):
-    print(f"Search request: category={category}, field={field}, description={description}, top_k={top_k}")
-    query_text = f"{category} {field} {description}"
-    
+    explanation = get_openai_response(messages, timeout=timeout)
+    if explanation is not None:
+        explanation_cache.put(cache_key, explanation)
+    return explanation
+
+# Run generate_explanation for every hit on a bounded thread pool.
+# Yields (index, explanation) pairs in completion order.
+def iter_explanations(query_text, hits, max_workers=None, timeout=None):
+    if not hits:
+        return
+    workers = max(1, min(max_workers or EXPLANATION_MAX_WORKERS, len(hits)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(generate_explanation, query_text, hit, timeout): index
+            for index, hit in enumerate(hits)
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                explanation = future.result()
+            except Exception as e:
+                print(f"Error generating explanation {index + 1}: {str(e)}")
+                explanation = None
+            yield index, explanation
+
+# Generate explanations concurrently, returned in the same order as hits
+def generate_explanations(query_text, hits, max_workers=None, timeout=None):
+    explanations = [None] * len(hits)
+    for index, explanation in iter_explanations(query_text, hits, max_workers, timeout):
+        explanations[index] = explanation
+    return explanations
+
+# Map a raw index document to the response shape used by the API
+def format_result(result, explanation=None):
+    formatted = {
+        "researcher_id": result.get("researcher_id", "不明"),
+        "research_field_jp": result.get("research_field_pi", "不明"),  # Map to expected response model field
+        "keywords_jp": result.get("keywords_pi", "不明"),  # Map to expected response model field
+        "research_project_title": result.get("research_project_title", "不明"),
+        "explanation": explanation,
+        "score": result.get('@search.score', 0),  # Get score
+    }
+    if "projects" in result:
+        formatted["projects"] = result["projects"]
+    return formatted
+
+# Number of project documents to fetch so grouping still yields top_k distinct researchers
+def candidate_count(top_k, aggregation=None):
+    if not aggregation:
+        return top_k
+    return max(top_k, min(top_k * SEARCH_OVERFETCH, SEARCH_MAX_CANDIDATES))
+
+# Collapse project hits into one hit per researcher_id, best researcher first.
+# aggregation: "max" (best project), "sum" (all projects) or "top_n_mean" (mean of the top_n best).
+# Each grouped hit keeps its best project's fields and lists its top_n projects under "projects".
+def group_by_researcher(hits, top_k, aggregation="max", top_n=None):
+    top_n = top_n or SEARCH_AGGREGATION_TOP_N
+    groups = {}
+    for hit in hits:
+        groups.setdefault(hit.get("researcher_id"), []).append(hit)
+
+    grouped = []
+    for projects in groups.values():
+        projects.sort(key=lambda hit: -hit.get("@search.score", 0))
+        scores = [hit.get("@search.score", 0) for hit in projects]
+        if aggregation == "max":
+            score = scores[0]
+        elif aggregation == "sum":
+            score = sum(scores)
+        elif aggregation == "top_n_mean":
+            score = sum(scores[:top_n]) / min(top_n, len(scores))
+        else:
+            raise ValueError(f"Unknown aggregation: {aggregation}")
+        hit = dict(projects[0])
+        hit["@search.score"] = score
+        hit["projects"] = [
+            {"id": p.get("id"), "research_project_title": p.get("research_project_title"), "score": p.get("@search.score", 0)}
+            for p in projects[:top_n]
+        ]
+        grouped.append(hit)
+    grouped.sort(key=lambda hit: -hit["@search.score"])
+    return grouped[:top_k]
+
+# Backend keyword arguments for a search mode ("hybrid" also matches query_text against the keyword fields)
+def search_options(query_text, mode=None, filters=None):
+    mode = mode or SEARCH_MODE
+    if mode not in ("vector", "hybrid"):
+        raise ValueError(f"Unknown search mode: {mode}")
+    return {"search_text": query_text if mode == "hybrid" else None, "filters": filters or None}
+
+# Embed the query and fetch the nearest documents (score order, no explanations)
+def find_candidates(query_text, top_k=10, mode=None, filters=None):
     try:
         print(f"Generating embedding for: {query_text}")
         embedding = get_embedding(query_text)
@@ -154,53 +433,58 @@ def search_researchers(category, field, description, top_k=10):
         print(f"Error getting embedding: {str(e)}")
         return []
 
-    # Explore index structure first
-    explore_index_structure()
+    if search_backend is None:
+        print("Search backend not initialized")
+        return []
 
     try:
         print("Executing vector search")
-        # Execute vector search
-        results = search_client.search(
-            search_text=None,  # No text query for vector-only search
-            vector_queries=[
-                VectorizedQuery(
-                    vector=embedding,
-                    k_nearest_neighbors=top_k,
-                    fields="research_field_vectorization"  # Correct field name
-                )
-            ],
-            select=["id", "researcher_id", "research_field_pi", "keywords_pi", "research_project_title"]
-        )
-
-        search_results = []
-        result_count = 0
-        
-        for result in results:
-            result_count += 1
-            try:
-                print(f"Processing result {result_count}")
-                explanation = generate_explanation(query_text, result)
-                search_results.append({
-                    "researcher_id": result.get("researcher_id", "不明"),
-                    "research_field_jp": result.get("research_field_pi", "不明"),  # Map to expected response model field
-                    "keywords_jp": result.get("keywords_pi", "不明"),  # Map to expected response model field
-                    "research_project_title": result.get("research_project_title", "不明"),
-                    "explanation": explanation,
-                    "score": result.get('@search.score', 0),  # Get score
-                })
-                print(f"Processed result {result_count}")
-            except Exception as e:
-                print(f"Error processing result {result_count}: {str(e)}")
-        
-        print(f"Found {len(search_results)} results")
-        return search_results
-    
+        options = search_options(query_text, mode, filters)
+        with metrics.SEARCH_SECONDS.labels(
+            backend=search_backend.name, mode="hybrid" if options["search_text"] else "vector"
+        ).time():
+            return search_backend.search(embedding, top_k, select=get_select_fields(), **options)
+
     except Exception as e:
         print(f"Search error: {str(e)}")
         if "Cannot find nested property" in str(e):
             print("Error hint: Index field names might not match. Run register_index.py to create a properly defined index and register researcher data.")
         return []
 
+# Vector search
+# explain=False skips the LLM explanations; max_workers / timeout tune the explanation fan-out.
+# mode="hybrid" adds keyword matching; filters (e.g. {"research_field_pi": "情報学"}) are pushed down to the index.
+# aggregation returns top_k distinct researchers (see group_by_researcher) with one explanation each.
+def search_researchers(category, field, description, top_k=10, explain=True, max_workers=None, timeout=None,
+                       mode=None, filters=None, aggregation=None, aggregation_top_n=None):
+    print(f"Search request: category={category}, field={field}, description={description}, top_k={top_k}")
+    query_text = f"{category} {field} {description}"
+
+    hits = find_candidates(query_text, candidate_count(top_k, aggregation), mode, filters)
+    if aggregation:
+        hits = group_by_researcher(hits, top_k, aggregation, aggregation_top_n)
+    if explain:
+        explanations = generate_explanations(query_text, hits, max_workers, timeout)
+    else:
+        explanations = [None] * len(hits)
+
+    search_results = [format_result(hit, explanation) for hit, explanation in zip(hits, explanations)]
+    print(f"Found {len(search_results)} results")
+    return search_results
+
+# Vector search that yields each result as soon as its explanation is ready.
+# Results arrive in completion order; "rank" keeps the original score order.
+def stream_search_researchers(category, field, description, top_k=10, max_workers=None, timeout=None,
+                              mode=None, filters=None, aggregation=None, aggregation_top_n=None):
+    query_text = f"{category} {field} {description}"
+    hits = find_candidates(query_text, candidate_count(top_k, aggregation), mode, filters)
+    if aggregation:
+        hits = group_by_researcher(hits, top_k, aggregation, aggregation_top_n)
+    for index, explanation in iter_explanations(query_text, hits, max_workers, timeout):
+        result = format_result(hits[index], explanation)
+        result["rank"] = index + 1
+        yield result
+
 # Test functionality when run directly
 if __name__ == "__main__":
     print("Script is running directly - performing a test search")
@@ -0,0 +1,86 @@
+import os
+import sys
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import matching  # noqa: E402
+import models  # noqa: E402
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(models.Company(company_id=1, company_name="Company", contract_plan="basic"))
+        session.add(models.CompanyUser(
+            company_user_id=1, company_user_name="user", company_id=1, email_address="user@example.com", password="x",
+        ))
+        session.add(models.ProjectInformation(
+            project_id=1, company_user_id=1, project_title="Project", consultation_category="joint research",
+            project_content="content", application_deadline=datetime(2030, 1, 1), registration_date=datetime(2024, 1, 1),
+        ))
+        session.add_all([
+            models.ResearcherInformation(researcher_id=researcher_id, researcher_name=f"researcher{researcher_id}")
+            for researcher_id in range(1, 5)
+        ])
+        session.add(models.MatchingInformation(
+            project_id=1, researcher_id=2, matching_reason="earlier", matching_status=1, matched_date=datetime(2024, 1, 1),
+        ))
+        session.commit()
+
+    statements = []
+    event.listen(engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, parameters, context, executemany:
+                 statements.append((statement, executemany)))
+    with Session(engine) as session:
+        yield session, statements
+
+
+def result(researcher_id, title, explanation=None):
+    return {"researcher_id": str(researcher_id), "research_project_title": title, "explanation": explanation}
+
+
+def test_create_matchings_skips_existing_and_inserts_in_one_executemany(db, monkeypatch):
+    session, statements = db
+    requested = []
+
+    def fake_explanations(query_text, hits, max_workers=None, timeout=None):
+        requested.extend(hit["researcher_id"] for hit in hits)
+        return ["generated" if hit["researcher_id"] == "3" else None for hit in hits]
+
+    monkeypatch.setattr(matching, "generate_explanations", fake_explanations)
+
+    created = matching.create_matchings(session, 1, "query", [
+        result(1, "first", "cached"),
+        result(1, "second (same researcher, lower rank)", "ignored"),
+        result(2, "already matched", "ignored"),
+        result(3, "needs explanation"),
+        result(4, "chat unavailable"),
+        {"researcher_id": "不明"},
+    ])
+
+    assert created == [1, 3, 4]
+    assert requested == ["3", "4"]
+    inserts = [(statement, executemany) for statement, executemany in statements if statement.startswith("INSERT")]
+    assert len(inserts) == 1
+    assert inserts[0][1] is True
+
+    rows = session.execute(
+        select(models.MatchingInformation.researcher_id, models.MatchingInformation.matching_reason)
+        .where(models.MatchingInformation.project_id == 1)
+        .order_by(models.MatchingInformation.researcher_id)
+    ).all()
+    assert [tuple(row) for row in rows] == [
+        (1, "cached"), (2, "earlier"), (3, "generated"), (4, "類似研究課題: chat unavailable"),
+    ]
+
+    # Running the same result set again creates nothing
+    statements.clear()
+    assert matching.create_matchings(session, 1, "query", [result(1, "first", "cached"), result(3, "x", "y")]) == []
+    assert not [statement for statement, _ in statements if statement.startswith("INSERT")]
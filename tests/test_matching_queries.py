@@ -0,0 +1,83 @@
+import os
+import sys
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import models  # noqa: E402
+import queries  # noqa: E402
+
+MANY = 25
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(models.Company(company_id=1, company_name="Company", contract_plan="basic"))
+        session.add_all([
+            models.ResearcherInformation(researcher_id=1, researcher_name="One matching"),
+            models.ResearcherInformation(researcher_id=2, researcher_name="Many matchings"),
+        ])
+        # Every matching gets its own project and company user, so per-row lazy loads would show up as extra queries
+        matching_id = 0
+        for researcher_id, count in ((1, 1), (2, MANY)):
+            for _ in range(count):
+                matching_id += 1
+                session.add(models.CompanyUser(
+                    company_user_id=matching_id, company_user_name=f"user{matching_id}", company_id=1,
+                    department="R&D", email_address=f"user{matching_id}@example.com", password="x",
+                ))
+                session.add(models.ProjectInformation(
+                    project_id=matching_id, company_user_id=matching_id, project_title=f"Project {matching_id}",
+                    consultation_category="joint research", project_content="content", research_field="field",
+                    application_deadline=datetime(2030, 1, 1), budget=1000000, registration_date=datetime(2024, 1, 1),
+                ))
+                session.add(models.MatchingInformation(
+                    matching_id=matching_id, project_id=matching_id, researcher_id=researcher_id,
+                    matching_reason="reason", matching_status=0, matched_date=datetime(2024, 1, 1),
+                ))
+        session.commit()
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    with Session(engine) as session:
+        yield session, statements
+
+
+# Same work as GET /matching-information: one query plus building the items
+def matching_list_statements(db, researcher_id):
+    session, statements = db
+    statements.clear()
+    items = [queries.matching_item(m) for m in session.execute(queries.matching_list_select(researcher_id, 0)).all()]
+    return items, len(statements)
+
+
+def test_matching_list_statement_count_does_not_grow_with_matchings(db):
+    one, one_count = matching_list_statements(db, 1)
+    many, many_count = matching_list_statements(db, 2)
+
+    assert len(one) == 1
+    assert len(many) == MANY
+    assert one_count == many_count == 1
+    assert {item["company_name"] for item in many} == {"Company"}
+    assert {item["project_title"] for item in many} == {f"Project {i}" for i in range(2, MANY + 2)}
+
+
+def test_matching_detail_statement_count(db):
+    session, statements = db
+    counts = []
+    for matching_id in (1, MANY + 1):
+        statements.clear()
+        item = queries.matching_detail_item(session.execute(queries.matching_detail_select(matching_id)).first())
+        counts.append(len(statements))
+        assert item["matching_id"] == matching_id
+        assert item["company_user_name"] == f"user{matching_id}"
+        assert item["company_name"] == "Company"
+
+    assert counts == [1, 1]
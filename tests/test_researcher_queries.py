@@ -0,0 +1,31 @@
+import os
+import sys
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import models  # noqa: E402
+import queries  # noqa: E402
+
+
+def test_researcher_filters_match_wildcards_literally():
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all([
+            models.ResearcherInformation(researcher_id=1, researcher_name="a", research_field_pi="100% 再生可能",
+                                         keywords_pi="snake_case"),
+            models.ResearcherInformation(researcher_id=2, researcher_name="b", research_field_pi="1000 再生可能",
+                                         keywords_pi="snakeXcase"),
+        ])
+        session.commit()
+
+        def ids(research_field=None, keywords=None):
+            stmt = queries.researcher_list_select(research_field, keywords)
+            return [row.researcher_id for row in session.execute(stmt)]
+
+        assert ids(research_field="100%") == [1]
+        assert ids(keywords=["snake_case"]) == [1]
+        assert ids(research_field="再生", keywords=["case"]) == [1, 2]
@@ -0,0 +1,614 @@
+import asyncio
+import json
+import math
+import os
+import re
+import time
+import unicodedata
+from abc import ABC, abstractmethod
+from collections import Counter, defaultdict
+
+import numpy as np
+from azure.search.documents.models import VectorFilterMode, VectorizedQuery
+
+# Fields every backend returns (same shape as the Azure AI Search select list)
+SELECT_FIELDS = ["id", "researcher_id", "research_field_pi", "keywords_pi", "research_project_title"]
+VECTOR_FIELD = "research_field_vectorization"
+# Full-text fields used by hybrid search and accepted as filter fields
+KEYWORD_FIELDS = ["keywords_pi", "research_field_pi", "research_project_title"]
+# Reciprocal rank fusion constant and candidates taken from each ranking before fusing
+RRF_K = 60
+HYBRID_CANDIDATES = 50
+
+_SEPARATORS = re.compile(r"[\s,、，。・/／;；:：()（）\[\]「」]+")
+
+
+# NFKC + lower case, split on separators, character bigrams inside each token (one-character tokens kept)
+def keyword_terms(text):
+    terms = []
+    for token in _SEPARATORS.split(unicodedata.normalize("NFKC", text or "").lower()):
+        if len(token) == 1:
+            terms.append(token)
+        else:
+            terms.extend(token[i:i + 2] for i in range(len(token) - 1))
+    return terms
+
+
+# filters: {field: value or [values]}; a document matches when every field contains one of its values
+def _filter_values(filters):
+    normalized = {}
+    for field, values in filters.items():
+        if field not in KEYWORD_FIELDS:
+            raise ValueError(f"Unsupported filter field: {field}")
+        values = [values] if isinstance(values, str) else list(values)
+        values = [unicodedata.normalize("NFKC", value).lower() for value in values if value]
+        if values:
+            normalized[field] = values
+    return normalized
+
+
+def matches_filters(document, filters):
+    for field, values in _filter_values(filters).items():
+        text = unicodedata.normalize("NFKC", str(document.get(field) or "")).lower()
+        if not any(value in text for value in values):
+            return False
+    return True
+
+
+# Same filters as an OData expression (phrase match on the searchable field)
+def odata_filter(filters):
+    clauses = []
+    for field, values in _filter_values(filters).items():
+        matches = [
+            "search.ismatch('\"{}\"', '{}')".format(value.replace('"', " ").replace("'", "''"), field)
+            for value in values
+        ]
+        clauses.append("(" + " or ".join(matches) + ")")
+    return " and ".join(clauses) or None
+
+
+# Fuse several best-first rankings: score = sum of 1 / (RRF_K + rank)
+def reciprocal_rank_fusion(rankings, top_k, k=RRF_K):
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] += 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: -item[1])[:top_k]
+
+
+class SearchBackend(ABC):
+    """Vector search backend interface used by search_vector.find_candidates.
+
+    search() returns plain dicts holding the select fields plus "@search.score", best match first.
+    With search_text it runs a hybrid query (keyword ranking over KEYWORD_FIELDS fused with the
+    vector ranking by RRF); filters restrict the candidates before either ranking is computed.
+    load_schema() returns the index fields as dicts with at least a "name" key, or None when the
+    backend has no way to fetch them (callers then keep the default select fields).
+    """
+
+    name = None
+
+    @abstractmethod
+    def search(self, embedding, top_k=10, select=SELECT_FIELDS, search_text=None, filters=None):
+        raise NotImplementedError
+
+    # Async variant for the async app; CPU-bound backends run search() in a worker thread
+    async def search_async(self, embedding, top_k=10, select=SELECT_FIELDS, search_text=None, filters=None):
+        return await asyncio.to_thread(self.search, embedding, top_k, select, search_text=search_text, filters=filters)
+
+    @abstractmethod
+    def load_schema(self):
+        raise NotImplementedError
+
+
+class AzureSearchBackend(SearchBackend):
+    name = "azure"
+
+    def __init__(self, search_client, index_client=None, index_name=None, async_search_client=None):
+        self.search_client = search_client
+        self.index_client = index_client
+        self.index_name = index_name
+        self.async_search_client = async_search_client
+
+    # Index definition from the service (one management call, no document query)
+    def load_schema(self):
+        if self.index_client is None:
+            return None
+        index = self.index_client.get_index(self.index_name)
+        return [
+            {
+                "name": field.name,
+                "type": str(field.type),
+                "searchable": bool(field.searchable),
+                "filterable": bool(field.filterable),
+                "retrievable": not field.hidden,
+            }
+            for field in index.fields
+        ]
+
+    # Hybrid queries are fused by the service itself (RRF over the BM25 and vector rankings);
+    # filters are applied before the kNN search (preFilter) so k neighbours all pass the filter.
+    def _query(self, embedding, top_k, select, search_text=None, filters=None):
+        query = dict(
+            search_text=search_text,  # None for vector-only search
+            vector_queries=[
+                VectorizedQuery(
+                    vector=embedding,
+                    k_nearest_neighbors=max(top_k, HYBRID_CANDIDATES) if search_text else top_k,
+                    fields=VECTOR_FIELD
+                )
+            ],
+            select=select,
+            top=top_k,
+        )
+        if search_text:
+            query["search_fields"] = KEYWORD_FIELDS
+        odata = odata_filter(filters) if filters else None
+        if odata:
+            query["filter"] = odata
+            query["vector_filter_mode"] = VectorFilterMode.PRE_FILTER
+        return query
+
+    def search(self, embedding, top_k=10, select=SELECT_FIELDS, search_text=None, filters=None):
+        results = self.search_client.search(**self._query(embedding, top_k, select, search_text, filters))
+        return [dict(result) for result in results]
+
+    async def search_async(self, embedding, top_k=10, select=SELECT_FIELDS, search_text=None, filters=None):
+        if self.async_search_client is None:
+            return await super().search_async(embedding, top_k, select, search_text, filters)
+        results = await self.async_search_client.search(**self._query(embedding, top_k, select, search_text, filters))
+        return [dict(result) async for result in results]
+
+
+# Write to <path>.tmp, fsync, then rename over <path>. The index files are memory-mapped (by this process and
+# by running servers), so they must never be rewritten in place; the rename leaves existing mappings intact.
+def _replace_file(path, write, mode="wb", **kwargs):
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, mode, **kwargs) as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _top_k(scores, top_k):
+    if top_k >= len(scores):
+        return np.argsort(-scores)
+    candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+    return candidates[np.argsort(-scores[candidates])]
+
+
+class CompactVectors:
+    """Compact copy of a vector matrix for the coarse search pass.
+
+    Rows are truncated to the first `dims` dimensions (text-embedding-3 vectors are Matryoshka-trained,
+    so a prefix is still a usable embedding), re-normalised and stored as float16, or as int8 codes
+    with one float32 scale per row (code * scale ~= value). Saved as <prefix>.npy (+ <prefix>.scales.npy)
+    and memory-mapped on load. numpy converts float16 to float32 slowly, so int8 is both smaller and faster.
+    """
+
+    PRECISIONS = ("float16", "int8")
+    # Size of one float32 block when converting the codes for scoring (small enough to stay in cache)
+    block_bytes = 16 * 1024 * 1024
+
+    def __init__(self, codes, scales=None):
+        self.codes = codes
+        self.scales = scales
+
+    @property
+    def precision(self):
+        return "int8" if self.codes.dtype == np.int8 else "float16"
+
+    @property
+    def dims(self):
+        return self.codes.shape[1]
+
+    @property
+    def block_rows(self):
+        return max(1, self.block_bytes // (4 * self.dims))
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    @classmethod
+    def quantize(cls, vectors, precision="int8", dims=None):
+        if precision not in cls.PRECISIONS:
+            raise ValueError(f"Unknown precision: {precision}")
+        dims = min(dims or vectors.shape[1], vectors.shape[1])
+        codes = np.empty((len(vectors), dims), dtype=np.int8 if precision == "int8" else np.float16)
+        scales = np.empty(len(vectors), dtype=np.float32) if precision == "int8" else None
+        compact = cls(codes, scales)
+        step = compact.block_rows
+        for start in range(0, len(vectors), step):
+            block = _normalize(np.asarray(vectors[start:start + step, :dims], dtype=np.float32))
+            if scales is None:
+                codes[start:start + step] = block
+                continue
+            block_scales = np.abs(block).max(axis=1) / 127
+            block_scales[block_scales == 0] = 1.0
+            codes[start:start + step] = np.rint(block / block_scales[:, None])
+            scales[start:start + step] = block_scales
+        return compact
+
+    @staticmethod
+    def file_prefix(path, precision, dims):
+        return f"{path}.{precision}-{dims}"
+
+    def save(self, prefix):
+        _replace_file(f"{prefix}.npy", lambda f: np.save(f, self.codes))
+        if self.scales is not None:
+            _replace_file(f"{prefix}.scales.npy", lambda f: np.save(f, self.scales))
+
+    @classmethod
+    def load(cls, prefix):
+        codes = np.load(f"{prefix}.npy", mmap_mode="r")
+        scales = np.load(f"{prefix}.scales.npy", mmap_mode="r") if codes.dtype == np.int8 else None
+        return cls(codes, scales)
+
+    # Approximate cosine similarity of every row (or of `rows`) to a normalised full-length query
+    def scores(self, query, rows=None):
+        query = _normalize(np.asarray(query[:self.dims], dtype=np.float32))
+        if rows is not None:
+            scores = np.asarray(self.codes[rows], dtype=np.float32) @ query
+            return scores * self.scales[rows] if self.scales is not None else scores
+        scores = np.empty(len(self.codes), dtype=np.float32)
+        step = self.block_rows
+        for start in range(0, len(self.codes), step):
+            scores[start:start + step] = np.asarray(self.codes[start:start + step], dtype=np.float32) @ query
+        return scores * self.scales if self.scales is not None else scores
+
+
+class KeywordIndex:
+    """Okapi BM25 over character bigrams of KEYWORD_FIELDS (offline counterpart of Azure full-text search)."""
+
+    def __init__(self, documents, fields=KEYWORD_FIELDS, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.count = len(documents)
+        self.lengths = np.zeros(self.count, dtype=np.float32)
+        postings = defaultdict(lambda: ([], []))
+        for row, document in enumerate(documents):
+            counts = Counter(keyword_terms(" ".join(str(document.get(field) or "") for field in fields)))
+            self.lengths[row] = sum(counts.values())
+            for term, tf in counts.items():
+                rows, tfs = postings[term]
+                rows.append(row)
+                tfs.append(tf)
+        self.avg_length = float(self.lengths.mean()) if self.count else 0.0
+        self.postings = {
+            term: (np.array(rows, dtype=np.int64), np.array(tfs, dtype=np.float32))
+            for term, (rows, tfs) in postings.items()
+        }
+
+    def scores(self, text):
+        scores = np.zeros(self.count, dtype=np.float32)
+        for term in set(keyword_terms(text)):
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            rows, tfs = posting
+            idf = math.log(1 + (self.count - len(rows) + 0.5) / (len(rows) + 0.5))
+            norm = tfs + self.k1 * (1 - self.b + self.b * self.lengths[rows] / (self.avg_length or 1.0))
+            scores[rows] += idf * tfs * (self.k1 + 1) / norm
+        return scores
+
+
+class LocalVectorIndex(SearchBackend):
+    """In-process cosine index over L2-normalised float32 researcher vectors.
+
+    Vectors are stored as <path>.npy (memory-mapped on load) with documents in <path>.json.
+    Exact search is a single matrix-vector product; build_ivf() adds an approximate
+    inverted-file index that only scores the n_probe closest clusters. use_compact() switches
+    the scoring pass to CompactVectors and rescores the best depth * rescore rows with the
+    memory-mapped float32 vectors, so only the compact copy has to stay resident. Hybrid search
+    and filters use a KeywordIndex and per-filter row lists built lazily from the documents.
+    """
+
+    name = "local"
+
+    def __init__(self, vectors, documents):
+        self.vectors = vectors
+        self.documents = documents
+        self.centroids = None
+        self.lists = None
+        self._assignments = None
+        self.n_probe = 8
+        self._keyword_index = None
+        self._filter_rows = {}
+        self.compact = None
+        self.compact_config = None
+        self.rescore = 4
+
+    @classmethod
+    def from_vectors(cls, vectors, documents):
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+        return cls(np.ascontiguousarray(vectors), list(documents))
+
+    @classmethod
+    def load(cls, path):
+        vectors = np.load(f"{path}.npy", mmap_mode="r")
+        with open(f"{path}.json", encoding="utf-8") as f:
+            documents = json.load(f)
+        index = cls(vectors, documents)
+        if os.path.exists(f"{path}.ivf.npz"):
+            ivf = np.load(f"{path}.ivf.npz")
+            index._set_ivf(ivf["centroids"], ivf["assignments"])
+        return index
+
+    def save(self, path):
+        _replace_file(f"{path}.npy", lambda f: np.save(f, np.asarray(self.vectors, dtype=np.float32)))
+        _replace_file(f"{path}.json", lambda f: json.dump(self.documents, f, ensure_ascii=False),
+                      mode="w", encoding="utf-8")
+        if self.centroids is not None:
+            _replace_file(f"{path}.ivf.npz",
+                          lambda f: np.savez(f, centroids=self.centroids, assignments=self._assignments))
+        elif os.path.exists(f"{path}.ivf.npz"):
+            # Upserts drop the IVF lists; a leftover file would be loaded against the new rows
+            os.remove(f"{path}.ivf.npz")
+        if self.compact_config is not None and len(self):
+            compact = self.compact_vectors()
+            compact.save(CompactVectors.file_prefix(path, compact.precision, compact.dims))
+
+    # Coarse pass over float16 / int8 vectors truncated to `dims` (precision "float32" switches it off).
+    # With a path, the compact file next to <path>.npy is memory-mapped, or (re)built when missing or older.
+    def use_compact(self, precision, dims=None, rescore=None, path=None):
+        self.rescore = rescore or self.rescore
+        self.compact = None
+        if precision == "float32":
+            self.compact_config = None
+            return
+        if precision not in CompactVectors.PRECISIONS:
+            raise ValueError(f"Unknown precision: {precision}")
+        self.compact_config = (precision, dims)
+        if path is None or not len(self):
+            return
+        dims = min(dims or self.vectors.shape[1], self.vectors.shape[1])
+        prefix = CompactVectors.file_prefix(path, precision, dims)
+        if os.path.exists(f"{prefix}.npy") and os.path.getmtime(f"{prefix}.npy") >= os.path.getmtime(f"{path}.npy"):
+            self.compact = CompactVectors.load(prefix)
+        else:
+            self.compact = CompactVectors.quantize(self.vectors, precision, dims)
+            self.compact.save(prefix)
+
+    def compact_vectors(self):
+        if self.compact is None and self.compact_config is not None and len(self):
+            self.compact = CompactVectors.quantize(self.vectors, *self.compact_config)
+        return self.compact
+
+    def __len__(self):
+        return len(self.documents)
+
+    # Insert or replace documents by "id"; the matrix is copied into memory on first write
+    def upsert(self, documents, vectors):
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+        if not self.documents:
+            self.vectors = np.empty((0, vectors.shape[1]), dtype=np.float32)
+        else:
+            self.vectors = np.array(self.vectors, dtype=np.float32)
+        self.documents = list(self.documents)
+
+        positions = {document["id"]: row for row, document in enumerate(self.documents)}
+        existing = len(self.documents)
+        new_documents, new_vectors = [], []
+        for document, vector in zip(documents, vectors):
+            row = positions.get(document["id"])
+            if row is None:
+                positions[document["id"]] = existing + len(new_documents)
+                new_documents.append(document)
+                new_vectors.append(vector)
+            elif row < existing:
+                self.documents[row] = document
+                self.vectors[row] = vector
+            else:
+                new_documents[row - existing] = document
+                new_vectors[row - existing] = vector
+        if new_documents:
+            self.documents.extend(new_documents)
+            self.vectors = np.concatenate([self.vectors, np.asarray(new_vectors, dtype=np.float32)])
+        self._drop_derived()
+
+    def delete(self, ids):
+        ids = set(ids)
+        keep = [row for row, document in enumerate(self.documents) if document["id"] not in ids]
+        if len(keep) == len(self.documents):
+            return
+        self.vectors = np.ascontiguousarray(np.asarray(self.vectors)[keep])
+        self.documents = [self.documents[row] for row in keep]
+        self._drop_derived()
+
+    # Cluster lists, keyword postings, filter rows and compact vectors no longer match the rows after a write;
+    # callers rebuild the IVF lists with build_ivf(), the others are rebuilt on the next query
+    def _drop_derived(self):
+        self.centroids = None
+        self.lists = None
+        self._assignments = None
+        self._keyword_index = None
+        self._filter_rows = {}
+        self.compact = None
+
+    # k-means clustering of the corpus into n_lists inverted lists
+    def build_ivf(self, n_lists=None, n_probe=8, iterations=10, sample_size=50000, seed=0):
+        count = len(self.documents)
+        n_lists = n_lists or max(1, int(np.sqrt(count)))
+        rng = np.random.default_rng(seed)
+        sample = self.vectors[rng.choice(count, size=min(count, sample_size), replace=False)]
+        centroids = np.array(sample[rng.choice(len(sample), size=n_lists, replace=False)])
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for cluster in range(n_lists):
+                members = sample[labels == cluster]
+                if len(members):
+                    centroids[cluster] = members.mean(axis=0)
+            centroids = _normalize(centroids)
+
+        assignments = np.empty(count, dtype=np.int32)
+        for start in range(0, count, 8192):
+            block = np.asarray(self.vectors[start:start + 8192])
+            assignments[start:start + 8192] = np.argmax(block @ centroids.T, axis=1)
+        self._set_ivf(centroids.astype(np.float32), assignments)
+        self.n_probe = n_probe
+
+    def _set_ivf(self, centroids, assignments):
+        self.centroids = centroids
+        self._assignments = assignments
+        order = np.argsort(assignments, kind="stable")
+        bounds = np.searchsorted(assignments[order], np.arange(len(centroids) + 1))
+        self.lists = [order[bounds[i]:bounds[i + 1]] for i in range(len(centroids))]
+
+    def load_schema(self):
+        names = list(self.documents[0]) if self.documents else list(SELECT_FIELDS)
+        return [{"name": name, "type": "Edm.String", "retrievable": True} for name in names] + [
+            {"name": VECTOR_FIELD, "type": "Collection(Edm.Single)", "retrievable": False}
+        ]
+
+    def keyword_index(self):
+        if self._keyword_index is None:
+            self._keyword_index = KeywordIndex(self.documents)
+        return self._keyword_index
+
+    # Rows passing the filters (cached per filter; a handful of distinct field filters are in use)
+    def filter_rows(self, filters):
+        key = json.dumps(filters, sort_keys=True, ensure_ascii=False)
+        rows = self._filter_rows.get(key)
+        if rows is None:
+            rows = np.array(
+                [row for row, document in enumerate(self.documents) if matches_filters(document, filters)],
+                dtype=np.int64,
+            )
+            if len(self._filter_rows) >= 256:
+                self._filter_rows.clear()
+            self._filter_rows[key] = rows
+        return rows
+
+    # Best-first (rows, scores) by cosine similarity; restricted rows are always scored exactly
+    # (with compact vectors: coarse scores first, then the shortlist rescored at full precision)
+    def _vector_ranking(self, query, depth, exact, rows=None):
+        if rows is None and not exact:
+            probes = _top_k(self.centroids @ query, min(self.n_probe, len(self.centroids)))
+            rows = np.concatenate([self.lists[p] for p in probes])
+            rows.sort()
+
+        compact = self.compact_vectors()
+        if compact is not None:
+            shortlist = _top_k(compact.scores(query, rows), depth * self.rescore)
+            shortlist.sort()
+            rows = shortlist if rows is None else rows[shortlist]
+        if rows is None:
+            scores = self.vectors @ query
+        else:
+            scores = np.asarray(self.vectors[rows]) @ query
+
+        best = _top_k(scores, depth)
+        return (best if rows is None else rows[best]), scores[best]
+
+    # Best-first rows by BM25 (documents without any matching term are left out)
+    def _keyword_ranking(self, search_text, depth, rows=None):
+        scores = self.keyword_index().scores(search_text)
+        if rows is not None:
+            scores = scores[rows]
+        matched = np.flatnonzero(scores > 0)
+        best = matched[_top_k(scores[matched], min(depth, len(matched)))]
+        return best if rows is None else rows[best]
+
+    def search(self, embedding, top_k=10, select=SELECT_FIELDS, exact=None, search_text=None, filters=None):
+        if not self.documents:
+            return []
+        query = _normalize(np.asarray(embedding, dtype=np.float32))
+        if exact is None:
+            exact = self.centroids is None
+
+        rows = self.filter_rows(filters) if filters else None
+        if rows is not None and not len(rows):
+            return []
+
+        if search_text:
+            depth = max(top_k, HYBRID_CANDIDATES)
+            vector_rows, _ = self._vector_ranking(query, depth, exact, rows)
+            keyword_rows = self._keyword_ranking(search_text, depth, rows)
+            ranked = reciprocal_rank_fusion([vector_rows.tolist(), keyword_rows.tolist()], top_k)
+        else:
+            best_rows, scores = self._vector_ranking(query, top_k, exact, rows)
+            ranked = zip(best_rows.tolist(), scores.tolist())
+
+        results = []
+        for row, score in ranked:
+            document = {field: self.documents[row].get(field) for field in select}
+            document["@search.score"] = float(score)
+            results.append(document)
+        return results
+
+# Recall/latency benchmark for exact vs IVF search and for compact (float16 / int8, truncated) storage
+# on a synthetic clustered corpus
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="LocalVectorIndex recall/latency benchmark")
+    parser.add_argument("--count", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--n-probe", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--precision", nargs="+", default=["float16", "int8"], choices=CompactVectors.PRECISIONS)
+    parser.add_argument("--dims", type=int, nargs="+", default=[0],
+                        help="truncated dimensions for the compact vectors (0 = full length)")
+    parser.add_argument("--rescore", type=int, nargs="+", default=[1, 4],
+                        help="shortlist size as a multiple of top_k (1 = coarse ranking only)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    # Variance decays along the dimensions, like Matryoshka-trained embeddings whose prefixes carry most of the signal
+    spectrum = (1.0 / np.sqrt(1.0 + np.arange(args.dim) / (args.dim / 16))).astype(np.float32)
+    topics = rng.standard_normal((200, args.dim)).astype(np.float32) * spectrum
+    vectors = topics[rng.integers(0, len(topics), args.count)] + 0.5 * rng.standard_normal((args.count, args.dim)).astype(np.float32) * spectrum
+    documents = [{"id": str(i), "researcher_id": i} for i in range(args.count)]
+    queries = vectors[rng.choice(args.count, args.queries, replace=False)] + 0.1 * rng.standard_normal((args.queries, args.dim)).astype(np.float32) * spectrum
+
+    index = LocalVectorIndex.from_vectors(vectors, documents)
+
+    def run(exact):
+        found = []
+        started = time.perf_counter()
+        for query in queries:
+            found.append({d["researcher_id"] for d in index.search(query, args.top_k, exact=exact)})
+        return found, (time.perf_counter() - started) / len(queries) * 1000
+
+    def recall(found, truth):
+        return np.mean([len(f & t) / len(t) for f, t in zip(found, truth)])
+
+    truth, exact_ms = run(True)
+    print(f"corpus={args.count} dim={args.dim} top_k={args.top_k}")
+    print(f"exact      : {exact_ms:.3f} ms/query  recall@{args.top_k}=1.000  vectors={index.vectors.nbytes / 2**20:.1f} MiB")
+
+    for precision in args.precision:
+        for dims in args.dims:
+            index.use_compact(precision, dims or None)
+            started = time.perf_counter()
+            compact = index.compact_vectors()
+            build_s = time.perf_counter() - started
+            print(f"{precision:<7} dims={compact.dims:<5}: {compact.nbytes / 2**20:.1f} MiB "
+                  f"({compact.nbytes / index.vectors.nbytes:.1%} of float32), built in {build_s:.2f} s")
+            for rescore in args.rescore:
+                index.rescore = rescore
+                found, compact_ms = run(True)
+                print(f"  rescore x{rescore:<3}: {compact_ms:.3f} ms/query  recall@{args.top_k}={recall(found, truth):.3f}")
+    index.use_compact("float32")
+
+    started = time.perf_counter()
+    index.build_ivf()
+    print(f"ivf build  : {time.perf_counter() - started:.2f} s ({len(index.centroids)} lists)")
+    for n_probe in args.n_probe:
+        index.n_probe = n_probe
+        found, ivf_ms = run(False)
+        print(f"ivf n_probe={n_probe:<3}: {ivf_ms:.3f} ms/query  recall@{args.top_k}={recall(found, truth):.3f}")